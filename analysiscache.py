@@ -0,0 +1,182 @@
+# -----------------------------------------------------------------------------
+# 8. Analysis Cache: class AnalysisCache
+# File: analysiscache.py
+# Persistent on-disk store for FileProcessor results, keyed by file content hash
+# plus analysis parameters. Arrays are plain .npy files opened memory-mapped.
+# -----------------------------------------------------------------------------
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+
+
+class AnalysisCache:
+    """
+    Directory layout:
+      <cache_dir>/entries/<key>/meta.json     scalars (duration, sr, params, ...)
+      <cache_dir>/entries/<key>/<name>.npy    one file per array (listed in meta['files'])
+      <cache_dir>/paths/<path hash>.json      size/mtime -> content hash memo
+    The mtime of meta.json is the LRU timestamp; it is touched on every hit.
+    """
+
+    def __init__(self, cache_dir="analysis_cache", max_bytes=2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.entries_dir = os.path.join(cache_dir, "entries")
+        self.paths_dir = os.path.join(cache_dir, "paths")
+        os.makedirs(self.entries_dir, exist_ok=True)
+        os.makedirs(self.paths_dir, exist_ok=True)
+
+    # --- Keys ----------------------------------------------------------------
+
+    def content_hash(self, file_path):
+        """Hash of the file content; memoized per (path, size, mtime) so unchanged files are not re-read."""
+        stat = os.stat(file_path)
+        abs_path = os.path.abspath(file_path)
+        memo_path = os.path.join(self.paths_dir, hashlib.sha1(abs_path.encode('utf-8')).hexdigest() + ".json")
+        try:
+            with open(memo_path, 'r', encoding='utf-8') as f:
+                memo = json.load(f)
+            if memo['size'] == stat.st_size and memo['mtime_ns'] == stat.st_mtime_ns:
+                return memo['hash']
+        except (OSError, ValueError, KeyError):
+            pass
+
+        digest = hashlib.blake2b(digest_size=16)
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        content_hash = digest.hexdigest()
+        self._write_json(memo_path, {'path': abs_path, 'size': stat.st_size,
+                                     'mtime_ns': stat.st_mtime_ns, 'hash': content_hash})
+        return content_hash
+
+    def make_key(self, file_path, params):
+        """Cache key for a file analyzed with the given parameter dict."""
+        params_hash = hashlib.sha1(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+        return f"{self.content_hash(file_path)}_{params_hash}"
+
+    # --- Entries -------------------------------------------------------------
+
+    def _entry_dir(self, key):
+        return os.path.join(self.entries_dir, key)
+
+    def contains(self, key):
+        return os.path.exists(os.path.join(self._entry_dir(key), "meta.json"))
+
+    def load(self, key):
+        """Returns (meta, arrays) with memory-mapped arrays, or None on a miss."""
+        entry_dir = self._entry_dir(key)
+        meta_path = os.path.join(entry_dir, "meta.json")
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            files = meta.get('files') or {name: name + ".npy" for name in meta['arrays']}
+            arrays = {name: np.load(os.path.join(entry_dir, file_name), mmap_mode='r')
+                      for name, file_name in files.items()}
+        except (OSError, ValueError, KeyError):
+            return None
+        os.utime(meta_path)  # mark as recently used
+        return meta, arrays
+
+    def create_work_dir(self):
+        """Temporary directory inside the cache (same filesystem, so commit() is a rename)."""
+        return tempfile.mkdtemp(prefix=".tmp_", dir=self.entries_dir)
+
+    def commit(self, key, meta, work_dir, files):
+        """
+        Turns a work directory whose .npy files were written in place (e.g. through
+        np.lib.format.open_memmap) into the entry for key. files maps array name
+        to file name inside work_dir. Evicts other entries down to max_bytes afterwards.
+        Returns False if nothing was stored; work_dir is then left untouched.
+        """
+        try:
+            size = sum(os.path.getsize(os.path.join(work_dir, name)) for name in files.values())
+            if size > self.max_bytes:
+                print(f"Analysis ({size / 1024 ** 2:.0f} MiB) exceeds the cache limit "
+                      f"({self.max_bytes / 1024 ** 2:.0f} MiB), not cached.")
+                return False
+            meta = dict(meta, arrays=list(files), files=files, bytes=size)
+            self._write_json(os.path.join(work_dir, "meta.json"), meta)
+
+            entry_dir = self._entry_dir(key)
+            if os.path.exists(entry_dir):
+                shutil.rmtree(entry_dir, ignore_errors=True)
+            try:
+                os.replace(work_dir, entry_dir)
+            except PermissionError:
+                # Windows refuses to rename directories with mapped files; copy instead,
+                # the work directory is removed later by evict()
+                shutil.copytree(work_dir, entry_dir)
+        except OSError as e:
+            print(f"Error writing analysis cache entry: {e}")
+            return False
+        self.evict(keep=key)
+        return True
+
+    def store(self, key, meta, arrays):
+        """Writes in-memory arrays as a new entry (atomically via a work directory)."""
+        work_dir = self.create_work_dir()
+        try:
+            files = {}
+            for name, array in arrays.items():
+                files[name] = name + ".npy"
+                np.save(os.path.join(work_dir, files[name]), np.asarray(array))
+        except OSError as e:
+            print(f"Error writing analysis cache entry: {e}")
+            shutil.rmtree(work_dir, ignore_errors=True)
+            return False
+        if not self.commit(key, meta, work_dir, files):
+            shutil.rmtree(work_dir, ignore_errors=True)
+            return False
+        return True
+
+    def evict(self, keep=None):
+        """Removes least recently used entries (except keep) until the cache fits into max_bytes."""
+        entries = []
+        for key in os.listdir(self.entries_dir):
+            if key.startswith(".tmp_"):
+                self._remove_stale_work_dir(key)
+                continue
+            meta_path = os.path.join(self._entry_dir(key), "meta.json")
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    size = json.load(f).get('bytes', 0)
+                entries.append((os.path.getmtime(meta_path), size, key))
+            except (OSError, ValueError):
+                continue
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            total -= size
+
+    def _remove_stale_work_dir(self, name, max_age=24 * 3600):
+        """Work directories left behind by an interrupted analysis."""
+        path = os.path.join(self.entries_dir, name)
+        try:
+            if time.time() - os.path.getmtime(path) > max_age:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
+
+    def _write_json(self, path, data):
+        # unique temp file per call: the loader and the playlist prefetch thread may write the same memo
+        fd, temp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
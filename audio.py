@@ -1,24 +1,103 @@
 # -----------------------------------------------------------------------------
-# 1. Audio Component:  class AudioDeviceManager, AudioProcessor 
+# 1. Audio Component:  class AudioSession, AudioDeviceManager, AudioProcessor 
 # File: audio.py
 # -----------------------------------------------------------------------------
 
 import pyaudio
 import numpy as np
 import threading
+import time
 
-# In audio.py
-from collections import deque
+class SharedInputStream:
+    """
+    One opened PortAudio input stream whose callback fans every buffer out to
+    all subscribed consumers. Consumers use the PortAudio callback signature
+    (in_data, frame_count, time_info, status); their return value is ignored.
+    """
+    def __init__(self, session, key, **stream_kwargs):
+        self.session = session
+        self.key = key
+        self.consumers = ()  # replaced, never mutated, so the callback needs no lock
+        self.closed = False
+        self.stream = session.p.open(input=True, stream_callback=self._callback, **stream_kwargs)
 
-# ... rest of code ...?
+    def _callback(self, in_data, frame_count, time_info, status):
+        for consumer in self.consumers:
+            consumer(in_data, frame_count, time_info, status)
+        return (None, pyaudio.paContinue)
+
+    def add(self, consumer):
+        """Subscribes a consumer; callers hold AudioSession._lock (see open_shared_input)."""
+        self.consumers = self.consumers + (consumer,)
+
+    def remove(self, consumer):
+        """Unsubscribes a consumer; the stream is closed when the last one leaves."""
+        with AudioSession._lock:
+            self.consumers = tuple(c for c in self.consumers if c != consumer)
+            if self.consumers:
+                return
+            self._detach()
+        self._stop()
+
+    def close(self):
+        """Closes the stream for all consumers; callers hold AudioSession._lock."""
+        self._detach()
+        self._stop()
+
+    def _detach(self):
+        # from now on open_shared_input opens a fresh stream for this key
+        self.closed = True
+        if self.session._streams.get(self.key) is self:
+            del self.session._streams[self.key]
+
+    def _stop(self):
+        try:
+            if self.stream.is_active():
+                self.stream.stop_stream()
+            self.stream.close()
+        except Exception as e:
+            print(f"Error closing shared audio stream: {e}")
+
+class AudioSession:
+    """
+    Process-wide, reference-counted PortAudio session.
+    PortAudio (and on Linux the whole ALSA probe) is initialized once, device
+    enumeration is cached, and input streams with identical parameters are
+    opened once and shared between consumers.
+    Use AudioSession.acquire() / session.release() instead of the constructor.
+    """
+    _lock = threading.Lock()
+    _instance = None
 
-class AudioDeviceManager:
     def __init__(self):
         self.p = pyaudio.PyAudio()
-        self.devices = self.get_audio_devices()
+        self.refcount = 0
+        self._devices = None
+        self._streams = {}
 
-    def get_audio_devices(self):
-        """Fetches all available audio input devices."""
+    @classmethod
+    def acquire(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            cls._instance.refcount += 1
+            return cls._instance
+
+    def release(self):
+        with AudioSession._lock:
+            self.refcount -= 1
+            if self.refcount > 0:
+                return
+            for shared in list(self._streams.values()):
+                shared.close()
+            self.p.terminate()
+            if AudioSession._instance is self:
+                AudioSession._instance = None
+
+    def get_input_devices(self, refresh=False):
+        """Fetches all available audio input devices (cached after the first call)."""
+        if self._devices is not None and not refresh:
+            return self._devices
         devices = []
         for i in range(self.p.get_device_count()):
             try:
@@ -32,34 +111,489 @@ class AudioDeviceManager:
                     })
             except:
                 continue
+        self._devices = devices
         return devices
 
-    def get_default_device(self):
-        """Returns the default audio input device index."""
+    def get_default_input_device(self):
         try:
-            default_info = self.p.get_default_input_device_info()
-            return default_info['index']
+            return self.p.get_default_input_device_info()['index']
         except:
-            return 0 if self.devices else None
+            return 0 if self.get_input_devices() else None
+
+    def open_shared_input(self, consumer, device_index=None, rate=44100, channels=1,
+                          format=pyaudio.paInt16, frames_per_buffer=1024):
+        """
+        Subscribes consumer to the input stream with these parameters, opening it
+        if nobody else has. The first opener decides frames_per_buffer.
+        """
+        key = (device_index, rate, channels, format)
+        with AudioSession._lock:
+            shared = self._streams.get(key)
+            if shared is None or shared.closed:
+                shared = SharedInputStream(self, key, format=format, channels=channels, rate=rate,
+                                           input_device_index=device_index,
+                                           frames_per_buffer=frames_per_buffer)
+                self._streams[key] = shared
+            shared.add(consumer)
+        return shared
+
+class AudioDeviceManager:
+    def __init__(self):
+        self.session = AudioSession.acquire()
+        self.p = self.session.p
+        self.devices = self.get_audio_devices()
+
+    def get_audio_devices(self, refresh=False):
+        """Fetches all available audio input devices."""
+        return self.session.get_input_devices(refresh)
+
+    def get_default_device(self):
+        """Returns the default audio input device index."""
+        return self.session.get_default_input_device()
+
+    def get_device_channels(self, device_index, max_channels=2):
+        """Input channel count to open for a device, capped at max_channels."""
+        for device in self.devices:
+            if device['index'] == device_index:
+                return max(1, min(max_channels, device['channels']))
+        return 1
 
     def close(self):
-        self.p.terminate()
+        self.session.release()
+
+class RingBuffer:
+    """
+    Preallocated single-producer/single-consumer sample ring of shape
+    (capacity, channels). The PortAudio callback thread only advances write_pos,
+    the render loop only advances read_pos, so neither side ever has to take a lock.
+    """
+    def __init__(self, capacity, channels=1, dtype=np.int16):
+        self.capacity = capacity
+        self.channels = channels
+        self.buffer = np.zeros((capacity, channels), dtype=dtype)
+        self.write_pos = 0  # total samples ever written
+        self.read_pos = 0   # write_pos seen by the last read
+        self.overruns = 0
+        self.underruns = 0
+
+    def reset(self):
+        self.buffer.fill(0)
+        self.write_pos = self.read_pos = 0
+        self.overruns = self.underruns = 0
+
+    def write(self, samples):
+        """Producer side: copies (n, channels) samples in, overwriting the oldest data."""
+        n = len(samples)
+        if n > self.capacity:
+            samples = samples[-self.capacity:]
+        start = self.write_pos % self.capacity
+        first = min(len(samples), self.capacity - start)
+        self.buffer[start:start + first] = samples[:first]
+        self.buffer[:len(samples) - first] = samples[first:]
+        # Unread samples were overwritten before the consumer got to them
+        if self.write_pos + n - self.read_pos > self.capacity:
+            self.overruns += 1
+        self.write_pos += n
+
+    def available(self):
+        return self.write_pos - self.read_pos
+
+    def read_at(self, end, out):
+        """Copies the len(out) sample frames ending at absolute position end into out."""
+        n = len(out)
+        start = end - n
+        if start < 0:  # not enough history yet, pad with silence
+            out[:-start].fill(0)
+            out, start = out[-start:], 0
+            n = len(out)
+        offset = start % self.capacity
+        first = min(n, self.capacity - offset)
+        out[:first] = self.buffer[offset:offset + first]
+        out[first:] = self.buffer[:n - first]
+
+    def read_latest(self, out):
+        """Consumer side: never blocks, fills out with the newest window."""
+        end = self.write_pos
+        if end == self.read_pos:
+            self.underruns += 1  # nothing new since the last frame
+        self.read_at(end, out)
+        self.read_pos = end
+        return out
+
+def _rfft_into(frame, out):
+    """Real FFT that writes into a preallocated buffer where NumPy supports it."""
+    try:
+        return np.fft.rfft(frame, out=out)
+    except TypeError:  # NumPy < 2.0 has no out= for the fft functions
+        out[:] = np.fft.rfft(frame)
+        return out
+
+class SpectrumAnalyzer:
+    """
+    Allocation-free magnitude spectrum for one FFT size.
+    Windows are cached per size, the real FFT only computes the positive half and
+    every step writes into float32 buffers that are reused across calls.
+    With rows=N the buffers get a leading axis and all N signals are transformed
+    by a single batched FFT along the last axis.
+    """
+    _windows = {}  # shared by all analyzers, keyed by FFT size
+
+    def __init__(self, fft_size, rows=None):
+        self.fft_size = fft_size
+        self.bins = fft_size // 2
+        self.rows = rows
+        lead = () if rows is None else (rows,)
+        self.window = self.get_window(fft_size)
+        self.samples = np.zeros(lead + (fft_size,), dtype=np.float32)
+        self._frame = np.zeros(lead + (fft_size,), dtype=np.float32)
+        self._spectrum = np.zeros(lead + (fft_size // 2 + 1,), dtype=np.complex64)
+        self._magnitude = np.zeros(lead + (fft_size // 2 + 1,), dtype=np.float32)
+        self.magnitude = self._magnitude[..., :self.bins]
+        self.log_magnitude = np.zeros(lead + (self.bins,), dtype=np.float32)
+
+    @classmethod
+    def get_window(cls, size):
+        window = cls._windows.get(size)
+        if window is None:
+            window = cls._windows[size] = np.hanning(size).astype(np.float32)
+        return window
+
+    def analyze(self, samples=None):
+        """
+        Returns (magnitude, 10*log10(magnitude + 1)), both views of internal buffers.
+        Without samples, the caller has already filled self.samples in place.
+        """
+        if samples is not None:
+            np.copyto(self.samples, samples, casting='unsafe')
+        np.multiply(self.samples, self.window, out=self._frame)
+        spectrum = _rfft_into(self._frame, self._spectrum)
+        np.abs(spectrum, out=self._magnitude)
+        np.add(self.magnitude, 1, out=self.log_magnitude)
+        np.log10(self.log_magnitude, out=self.log_magnitude)
+        np.multiply(self.log_magnitude, 10, out=self.log_magnitude)
+        return self.magnitude, self.log_magnitude
+
+    def rms(self, row=None):
+        """RMS of the samples passed to the last analyze() call."""
+        samples = self.samples if row is None else self.samples[row]
+        return float(np.sqrt(np.dot(samples, samples) / self.fft_size))
+
+class SpectralSmoother:
+    """
+    Frame-to-frame smoothing with O(bins) work per update.
+    Modes:
+      "mean"           - moving average over the last `history` frames, kept as a
+                         running sum over a fixed 2D ring array
+      "exponential"    - one-pole smoothing with alpha = 2 / (history + 1)
+      "attack_release" - one-pole smoothing with separate rise/fall coefficients
+    """
+    MODES = ("mean", "exponential", "attack_release")
+
+    def __init__(self, bins, history=10, mode="mean", attack=0.6, release=0.15, capacity=64):
+        # bins may also be a shape tuple, e.g. (rows, bins) to smooth several spectra at once
+        self.bins = bins
+        self.shape = bins if isinstance(bins, tuple) else (bins,)
+        self.mode = mode
+        self.attack = attack
+        self.release = release
+        self.capacity = max(capacity, history)
+        self.history = history
+        self.count = 0   # total frames pushed, selects the ring slot
+        self.filled = 0  # valid frames currently held in the ring
+        self.ring = np.zeros((self.capacity,) + self.shape, dtype=np.float32)
+        self.running_sum = np.zeros(self.shape, dtype=np.float64)
+        self.output = np.zeros(self.shape, dtype=np.float32)
+        self._delta = np.zeros(self.shape, dtype=np.float32)
+        self._coef = np.zeros(self.shape, dtype=np.float32)
+
+    def reset(self):
+        self.count = self.filled = 0
+        self.running_sum.fill(0)
+        self.output.fill(0)
+
+    def set_history(self, history):
+        """Changes the window length; only reallocates if it exceeds the ring capacity."""
+        history = max(1, int(history))
+        if history > self.capacity:
+            ring = np.zeros((history,) + self.shape, dtype=np.float32)
+            for age in range(self.filled):
+                ring[(self.count - 1 - age) % history] = self.ring[(self.count - 1 - age) % self.capacity]
+            self.ring, self.capacity = ring, history
+        self.history = history
+        self._resum()
+
+    def set_mode(self, mode):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown smoothing mode: {mode}")
+        if mode == "mean" and self.mode != "mean":
+            self._resum()
+        self.mode = mode
+
+    def _resum(self):
+        """Rebuilds the running sum from the ring (only on configuration changes)."""
+        self.running_sum.fill(0)
+        filled = min(self.filled, self.history)
+        for age in range(filled):
+            self.running_sum += self.ring[(self.count - 1 - age) % self.capacity]
+        if filled and self.mode == "mean":
+            np.divide(self.running_sum, filled, out=self.output, casting='unsafe')
+
+    def update(self, frame):
+        """Pushes one frame and returns the smoothed output buffer."""
+        slot = self.count % self.capacity
+        if self.mode == "mean":
+            if self.filled >= self.history:
+                self.running_sum -= self.ring[(self.count - self.history) % self.capacity]
+            self.running_sum += frame
+            self.ring[slot] = frame
+            self.count += 1
+            self.filled = min(self.filled + 1, self.capacity)
+            np.divide(self.running_sum, min(self.filled, self.history), out=self.output, casting='unsafe')
+            return self.output
+
+        self.ring[slot] = frame
+        if self.filled == 0:
+            self.output[:] = frame
+        else:
+            np.subtract(frame, self.output, out=self._delta)
+            if self.mode == "exponential":
+                self._delta *= 2.0 / (self.history + 1)
+            else:
+                # coef = attack where rising, release where falling
+                np.greater(self._delta, 0, out=self._coef, casting='unsafe')
+                self._coef *= self.attack - self.release
+                self._coef += self.release
+                self._delta *= self._coef
+            self.output += self._delta
+        self.count += 1
+        self.filled = min(self.filled + 1, self.capacity)
+        return self.output
+
+class BandMapper:
+    """
+    Reduces a magnitude spectrum to a fixed number of bars with one matrix-vector
+    product. The (bands x bins) weight matrix is built once per
+    (bins, bands, sample rate, layout) and cached for every caller.
+    Layouts: "linear", "log", "mel", "octave" (fractional octaves anchored at 1 kHz).
+    """
+    LAYOUTS = ("log", "mel", "octave", "linear")
+    MIN_FREQ = 20.0
+
+    _matrices = {}  # shared cache, keyed by (bins, bands, rate, layout)
+
+    def __init__(self):
+        self._outputs = {}
+
+    @classmethod
+    def get_matrix(cls, bins, bands, rate, layout="log"):
+        key = (bins, bands, rate, layout)
+        matrix = cls._matrices.get(key)
+        if matrix is None:
+            matrix = cls._matrices[key] = cls._build_matrix(bins, bands, rate, layout)
+        return matrix
+
+    @classmethod
+    def _band_edges(cls, bands, nyquist, layout):
+        if layout == "linear":
+            return np.linspace(0, nyquist, bands + 1)
+        if layout == "log":
+            return np.geomspace(cls.MIN_FREQ, nyquist, bands + 1)
+        if layout == "mel":
+            mel_max = 2595 * np.log10(1 + nyquist / 700)
+            return 700 * (10 ** (np.linspace(0, mel_max, bands + 2) / 2595) - 1)
+        if layout == "octave":
+            bands_per_octave = bands / np.log2(nyquist / cls.MIN_FREQ)
+            steps_below_1k = np.ceil(np.log2(1000 / cls.MIN_FREQ) * bands_per_octave)
+            f_min = 1000 / 2 ** (steps_below_1k / bands_per_octave)
+            return np.minimum(f_min * 2 ** (np.arange(bands + 1) / bands_per_octave), nyquist)
+        raise ValueError(f"Unknown band layout: {layout}")
+
+    @classmethod
+    def _build_matrix(cls, bins, bands, rate, layout):
+        nyquist = rate / 2
+        freqs = np.arange(bins) * nyquist / bins
+        edges = cls._band_edges(bands, nyquist, layout)
+        matrix = np.zeros((bands, bins), dtype=np.float32)
+
+        for band in range(bands):
+            if layout == "mel":  # triangular filters over three consecutive edges
+                low, center, high = edges[band], edges[band + 1], edges[band + 2]
+                rising = (freqs - low) / max(center - low, 1e-9)
+                falling = (high - freqs) / max(high - center, 1e-9)
+                weights = np.maximum(0, np.minimum(rising, falling))
+            else:  # rectangular: plain mean of the bins inside the band
+                low, high = edges[band], edges[band + 1]
+                center = np.sqrt(low * high) if low > 0 else high / 2
+                weights = ((freqs >= low) & (freqs < high)).astype(np.float32)
+            if weights.sum() == 0:  # band narrower than one bin: use the nearest bin
+                weights = np.zeros(bins)
+                weights[min(bins - 1, int(round(center * bins / nyquist)))] = 1
+            matrix[band] = weights / weights.sum()
+        return matrix
+
+    def map(self, spectrum, bands, rate, layout="log"):
+        """Returns the band vector (a reused float32 buffer) for the given spectrum."""
+        key = (len(spectrum), bands, rate, layout)
+        out = self._outputs.get(key)
+        if out is None:
+            out = self._outputs[key] = np.zeros(bands, dtype=np.float32)
+        matrix = self.get_matrix(*key)
+        if spectrum.dtype == np.float32:
+            return np.dot(matrix, spectrum, out=out)
+        out[:] = matrix @ spectrum
+        return out
+
+class OnsetDetector:
+    """
+    Streaming multi-band spectral flux with an adaptive threshold.
+    The rectified per-bin flux is folded into a few log bands with one cached
+    BandMapper matrix, so each frame costs a handful of vectorized ops.
+    """
+    def __init__(self, bins, rate, frame_rate, bands=6, threshold=1.5, min_interval=0.1, adapt_seconds=1.0):
+        self.band_matrix = BandMapper.get_matrix(bins, bands, rate, "log")
+        self.threshold = threshold
+        self.min_gap = max(1, int(min_interval * frame_rate))
+        self.adapt = 1.0 / max(1.0, adapt_seconds * frame_rate)
+        self._previous = np.zeros(bins, dtype=np.float32)
+        self._diff = np.zeros(bins, dtype=np.float32)
+        self.band_flux = np.zeros(bands, dtype=np.float32)
+        self.mean = 0.0
+        self.var = 0.0
+        self.value = 0.0
+        self.frames_since_onset = 0
+        self._started = False
+
+    def process(self, log_spectrum):
+        """Feeds one log-magnitude frame; returns (onset strength, is_onset)."""
+        np.subtract(log_spectrum, self._previous, out=self._diff)
+        np.maximum(self._diff, 0, out=self._diff)
+        self._previous[:] = log_spectrum
+        if not self._started:  # the first frame has no predecessor
+            self._started = True
+            return 0.0, False
+
+        np.dot(self.band_matrix, self._diff, out=self.band_flux)
+        value = float(self.band_flux.mean())
+
+        # Exponential running mean / variance as the adaptive threshold
+        deviation = value - self.mean
+        self.mean += self.adapt * deviation
+        self.var = (1 - self.adapt) * (self.var + self.adapt * deviation * deviation)
+        limit = self.mean + self.threshold * np.sqrt(self.var)
+
+        self.frames_since_onset += 1
+        is_onset = value > limit and self.value <= value and self.frames_since_onset >= self.min_gap
+        if is_onset:
+            self.frames_since_onset = 0
+        self.value = value
+        return max(0.0, deviation), is_onset
+
+class TempoTracker:
+    """
+    Incremental autocorrelation tempo estimator with a beat phase oscillator.
+    Each frame updates a decaying autocorrelation over the BPM lag range, which
+    is constant work per frame regardless of how long the music has played.
+    """
+    def __init__(self, frame_rate, min_bpm=60, max_bpm=200, half_life=4.0, prior_bpm=120):
+        self.frame_rate = frame_rate
+        self.min_lag = max(1, int(frame_rate * 60 / max_bpm))
+        self.max_lag = int(np.ceil(frame_rate * 60 / min_bpm))
+        self.decay = 0.5 ** (1.0 / (half_life * frame_rate))
+
+        # Envelope history written twice so the last max_lag+1 values are always contiguous
+        self._size = self.max_lag + 1
+        self._history = np.zeros(2 * self._size, dtype=np.float32)
+        self._pos = 0
+        self.acf = np.zeros(self._size, dtype=np.float32)  # acf[lag], lag 0 = energy
+        self._products = np.zeros(self._size, dtype=np.float32)
+
+        # Log-Gaussian preference around prior_bpm to avoid octave errors
+        lags = np.arange(self._size, dtype=np.float32)
+        lags[0] = 1
+        self._prior = np.exp(-0.5 * (np.log2(60 * frame_rate / lags / prior_bpm) / 1.0) ** 2).astype(np.float32)
+        self._prior[:self.min_lag] = 0
+        self._weighted = np.zeros(self._size, dtype=np.float32)
+
+        self.bpm = 0.0
+        self.confidence = 0.0
+        self.phase = 0.0
+        self.period = 0.0  # frames per beat
+
+    def update(self, onset_strength, is_onset=False):
+        """Feeds one onset envelope value; returns True when the phase wraps (predicted beat)."""
+        self._history[self._pos] = self._history[self._pos + self._size] = onset_strength
+        self._pos = (self._pos + 1) % self._size
+        # window[-1] is the newest sample, window[-1 - lag] the one lag frames ago
+        window = self._history[self._pos:self._pos + self._size]
+        np.multiply(window[::-1], onset_strength, out=self._products)
+        self.acf *= self.decay
+        self.acf += self._products
+
+        self._estimate()
+        return self._advance_phase(is_onset)
+
+    def _estimate(self):
+        energy = self.acf[0]
+        if energy <= 1e-9:
+            return
+        np.multiply(self.acf, self._prior, out=self._weighted)
+        lag = int(np.argmax(self._weighted))
+        if lag < self.min_lag or lag >= self.max_lag:
+            return
+        # Parabolic interpolation for a sub-frame lag estimate
+        left, center, right = self.acf[lag - 1], self.acf[lag], self.acf[lag + 1]
+        denominator = left - 2 * center + right
+        offset = 0.5 * (left - right) / denominator if denominator < 0 else 0.0
+        self.period = float(lag + offset)
+        self.bpm = 60.0 * self.frame_rate / self.period
+        self.confidence = float(min(1.0, max(0.0, center / energy)))
+
+    def _advance_phase(self, is_onset):
+        if self.period <= 0:
+            return False
+        self.phase += 1.0 / self.period
+        if is_onset:
+            # Pull the oscillator toward the onset, weighted by how sure the tempo is
+            error = self.phase - round(self.phase)
+            self.phase -= 0.5 * self.confidence * error
+        if self.phase >= 1.0:
+            self.phase %= 1.0
+            return True
+        if self.phase < 0:
+            self.phase %= 1.0
+        return False
 
 class AudioProcessor:
-    def __init__(self, device_index=None, chunk_size=2048, format=pyaudio.paInt16, channels=1, rate=44100):
+    def __init__(self, device_index=None, chunk_size=2048, format=pyaudio.paInt16, channels=1, rate=44100,
+                 capture_mode="blocking", fft_size=None, hop_size=None, max_frames_per_render=8):
         self.chunk_size = chunk_size
+        # Analysis frames overlap: fft_size sets the frequency resolution, hop_size
+        # the time resolution. The defaults reproduce one non-overlapping chunk.
+        self.fft_size = fft_size or chunk_size
+        self.hop_size = hop_size or chunk_size
+        self.max_frames_per_render = max_frames_per_render
         self.format = format
-        self.channels = channels
         self.rate = rate
         self.device_index = device_index
+        # "blocking": stream.read() in the render loop
+        # "callback": PortAudio fills a ring buffer, the render loop never waits
+        self.capture_mode = capture_mode
         
-        self.p = pyaudio.PyAudio()
+        self.session = AudioSession.acquire()
+        self.p = self.session.p
         self.stream = None
+        self.shared_stream = None  # callback mode subscribes to a session-wide stream
         self.is_active = False
+        self._setup_channels(channels)
+        self._analysis_pos = 0  # ring position where the last analysis frame ended
         
-        # Audio analysis state
-        self.fft_history = deque(maxlen=10)
-        self.bass_history = deque(maxlen=5)
+        # Audio analysis state, history lengths are kept constant in seconds
+        frames_per_chunk = max(1, chunk_size // self.hop_size)
+        self.bass_average = SpectralSmoother(1, history=4 * frames_per_chunk)  # bass energy of the previous frames
+        self._bass_energy = np.zeros(1, dtype=np.float32)
+        frame_rate = rate / self.hop_size
+        self.onset_detector = OnsetDetector(self.analyzer.bins, rate, frame_rate)
+        self.tempo = TempoTracker(frame_rate)
         self.beat_sensitivity = 1.5
         
         # UI stats
@@ -70,62 +604,111 @@ class AudioProcessor:
         
         self.start_stream()
 
+    def _setup_channels(self, channels):
+        """
+        Allocates the per-channel buffers. Analysis rows are the input channels,
+        then the mix (mean of all channels) and, for stereo, the side signal, so
+        one batched FFT produces every spectrum. Mono only has the one row.
+        """
+        self.channels = channels
+        self.mix_row = 0 if channels == 1 else channels
+        self.side_row = channels + 1 if channels == 2 else None
+        rows = 1 if channels == 1 else channels + (2 if channels == 2 else 1)
+        
+        # Sliding sample buffer shared by both capture modes
+        self.ring = RingBuffer(max(self.fft_size, self.hop_size * self.max_frames_per_render) * 4, channels)
+        self._window = np.zeros((self.fft_size, channels), dtype=np.int16)
+        self.analyzer = SpectrumAnalyzer(self.fft_size, rows=rows)
+        # keep a mode/history chosen through set_smoothing across device and channel changes
+        previous = getattr(self, 'smoother', None)
+        if previous is not None:
+            self.smoother = SpectralSmoother((rows, self.analyzer.bins), history=previous.history, mode=previous.mode,
+                                             attack=previous.attack, release=previous.release)
+        else:
+            frames_per_chunk = max(1, self.chunk_size // self.hop_size)
+            self.smoother = SpectralSmoother((rows, self.analyzer.bins), history=10 * frames_per_chunk)
+
     def start_stream(self):
         """Starts or restarts the audio stream."""
         try:
-            if self.stream and self.stream.is_active():
-                self.stream.stop_stream()
-                self.stream.close()
+            self._close_stream()
             
-            self.stream = self.p.open(
-                format=self.format,
-                channels=self.channels,
-                rate=self.rate,
-                input=True,
-                input_device_index=self.device_index,
-                frames_per_buffer=self.chunk_size
-            )
+            self.ring.reset()
+            self._analysis_pos = 0
+            if self.capture_mode == "callback":
+                self.shared_stream = self.session.open_shared_input(
+                    self._stream_callback,
+                    device_index=self.device_index,
+                    rate=self.rate,
+                    channels=self.channels,
+                    format=self.format,
+                    frames_per_buffer=self.hop_size
+                )
+                self.stream = self.shared_stream.stream
+            else:
+                self.stream = self.p.open(
+                    format=self.format,
+                    channels=self.channels,
+                    rate=self.rate,
+                    input=True,
+                    input_device_index=self.device_index,
+                    frames_per_buffer=self.hop_size
+                )
             self.is_active = True
             print(f"Audio stream started for device index: {self.device_index}")
         except Exception as e:
             print(f"Error starting audio stream: {e}")
             self.is_active = False
             
-    def change_device(self, device_index):
-        """Changes the audio input device."""
+    def _stream_callback(self, in_data, frame_count, time_info, status):
+        """Runs on the PortAudio thread: only copies samples into the ring."""
+        # Zero-copy deinterleave: (frames, channels) view of the PortAudio buffer
+        self.ring.write(np.frombuffer(in_data, dtype=np.int16).reshape(-1, self.channels))
+        if status & pyaudio.paInputOverflow:
+            self.ring.overruns += 1
+        return (None, pyaudio.paContinue)
+
+    def change_device(self, device_index, channels=None):
+        """Changes the audio input device, optionally with a new channel count."""
         self.device_index = device_index
+        if channels and channels != self.channels:
+            self.stop()
+            self._setup_channels(channels)
         self.start_stream()
 
     def get_all_audio_data(self):
         if not self.is_active or not self.stream:
-            return np.zeros(self.chunk_size // 2), False, 0, 0
+            return np.zeros(self.analyzer.bins), False, 0, 0
         
         try:
-            data = self.stream.read(self.chunk_size, exception_on_overflow=False)
-            audio_data = np.frombuffer(data, dtype=np.int16)
-            
-            windowed_data = audio_data * np.hanning(len(audio_data))
-            fft_raw = np.abs(np.fft.fft(windowed_data))[:self.chunk_size // 2]
-            fft_data = np.log10(fft_raw + 1) * 10
+            if self.capture_mode != "callback":
+                # Drain every complete hop the device has buffered (at least one, which blocks),
+                # otherwise a device chunk larger than the hop leaves the analysis further behind each frame
+                hops = max(1, self.stream.get_read_available() // self.hop_size)
+                data = self.stream.read(hops * self.hop_size, exception_on_overflow=False)
+                self.ring.write(np.frombuffer(data, dtype=np.int16).reshape(-1, self.channels))
             
-            self.fft_history.append(fft_data)
-            smoothed_fft = np.mean(self.fft_history, axis=0) if self.fft_history else fft_data
-            
-            bass_end_index = int(250 * self.chunk_size / self.rate)
-            bass_energy = np.sum(fft_raw[:bass_end_index])
-            self.bass_history.append(bass_energy)
+            # Run every complete hop that arrived since the last render frame
+            pending = (self.ring.write_pos - self._analysis_pos) // self.hop_size
+            if pending == 0:
+                self.ring.underruns += 1
+            elif pending > self.max_frames_per_render:  # fell behind, only keep the newest frames
+                self._analysis_pos += (pending - self.max_frames_per_render) * self.hop_size
+                pending = self.max_frames_per_render
             
             is_beat = False
-            if len(self.bass_history) > 2:
-                avg_bass = np.mean(list(self.bass_history)[:-1])
-                is_beat = bass_energy > avg_bass * self.beat_sensitivity
+            for _ in range(pending):
+                self._analysis_pos += self.hop_size
+                self.ring.read_at(self._analysis_pos, self._window)
+                is_beat = self._analyze_frame(self._window) or is_beat
+            self.ring.read_pos = self._analysis_pos
             
             current_time = time.time()
             if is_beat and (current_time - self.last_beat_time) > 0.1:
                 self.beats_detected += 1
                 self.last_beat_time = current_time
             
-            rms = np.sqrt(np.mean(audio_data**2))
+            rms = self.analyzer.rms(self.mix_row)
             self.current_level = min(100, rms / 327.67)
             
             if self.current_level > self.peak_level:
@@ -133,17 +716,85 @@ class AudioProcessor:
             else:
                 self.peak_level *= 0.98
                 
-            return smoothed_fft, is_beat, self.current_level, self.peak_level
+            return self.smoother.output[self.mix_row], is_beat, self.current_level, self.peak_level
             
         except IOError:
-            return np.zeros(self.chunk_size // 2), False, 0, 0
+            return np.zeros(self.analyzer.bins), False, 0, 0
+
+    def _analyze_frame(self, audio_data):
+        """Analyzes one STFT frame, updates smoothing and returns the bass beat flag."""
+        samples = self.analyzer.samples
+        np.copyto(samples[:self.channels], audio_data.T, casting='unsafe')
+        if self.channels > 1:
+            np.mean(samples[:self.channels], axis=0, out=samples[self.mix_row])
+        if self.side_row is not None:
+            np.subtract(samples[0], samples[1], out=samples[self.side_row])
+            samples[self.side_row] *= 0.5
+        spectra_raw, spectra = self.analyzer.analyze()
+        fft_raw, fft_data = spectra_raw[self.mix_row], spectra[self.mix_row]
+        
+        self.smoother.update(spectra)
+        onset_strength, is_onset = self.onset_detector.process(fft_data)
+        self.tempo.update(onset_strength, is_onset)
+        
+        bass_end_index = int(250 * self.fft_size / self.rate)
+        bass_energy = float(np.sum(fft_raw[:bass_end_index]))
+        
+        is_beat = False
+        if self.bass_average.filled >= 2:
+            avg_bass = self.bass_average.output[0]
+            is_beat = bass_energy > avg_bass * self.beat_sensitivity
+        self._bass_energy[0] = bass_energy
+        self.bass_average.update(self._bass_energy)
+        return is_beat
+
+    def get_channel_spectra(self):
+        """Smoothed log spectra per input channel, shape (channels, bins)."""
+        return self.smoother.output[:self.channels]
+
+    def get_mid_side_spectra(self):
+        """Smoothed (mid, side) spectra; side is None unless the input is stereo."""
+        side = self.smoother.output[self.side_row] if self.side_row is not None else None
+        return self.smoother.output[self.mix_row], side
+
+    def get_mixed_spectrum(self):
+        """Smoothed spectrum of the downmix (mean of all channels)."""
+        return self.smoother.output[self.mix_row]
+
+    def set_smoothing(self, history=None, mode=None):
+        """Reconfigures spectral smoothing at runtime."""
+        if mode is not None:
+            self.smoother.set_mode(mode)
+        if history is not None:
+            self.smoother.set_history(history)
 
     def get_beat_stats(self):
-        return self.beats_detected, 0 # BPM calculation can be improved
+        return self.beats_detected, int(round(self.tempo.bpm))
+
+    def get_tempo(self):
+        """Returns (bpm, confidence 0..1, beat phase 0..1) from the onset tempo tracker."""
+        return self.tempo.bpm, self.tempo.confidence, self.tempo.phase
+
+    def get_capture_stats(self):
+        """Returns ring buffer overrun/underrun counters (callback mode only)."""
+        return {'overruns': self.ring.overruns, 'underruns': self.ring.underruns}
+
+    def _close_stream(self):
+        if self.shared_stream:
+            self.shared_stream.remove(self._stream_callback)
+            self.shared_stream = None
+        elif self.stream:
+            if self.stream.is_active():
+                self.stream.stop_stream()
+            self.stream.close()
+        self.stream = None
 
     def stop(self):
         """Closes the audio stream."""
-        if self.stream:
-            self.stream.stop_stream()
-            self.stream.close()
+        self._close_stream()
         self.is_active = False
+
+    def close(self):
+        """Closes the stream and releases the shared audio session."""
+        self.stop()
+        self.session.release()
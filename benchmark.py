@@ -0,0 +1,165 @@
+# -----------------------------------------------------------------------------
+# 7. Benchmarks: microbenchmarks for the hot paths
+# File: benchmark.py
+# Usage: python benchmark.py fft [--size 2048] [--iterations 2000]
+#        python benchmark.py decode <audio file> [--sr 44100]
+#        python benchmark.py particles [--count 10000] [--frames 200]
+# -----------------------------------------------------------------------------
+import argparse
+import multiprocessing
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+from audio import SpectrumAnalyzer
+
+
+def measure(func, iterations):
+    """Returns (microseconds per call, bytes allocated per call) for func()."""
+    func()  # warm up caches and lazily created buffers
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    per_call_us = (time.perf_counter() - start) / iterations * 1e6
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return per_call_us, peak - baseline
+
+
+def print_result(name, per_call_us, allocated):
+    print(f"{name:<28} {per_call_us:9.1f} us/call {allocated / 1024:9.1f} KiB allocated/call")
+
+
+def bench_fft(size, iterations):
+    """Legacy per-call FFT path vs. the cached SpectrumAnalyzer."""
+    samples = (np.random.randn(size) * 3000).astype(np.int16)
+
+    def legacy():
+        windowed_data = samples * np.hanning(len(samples))
+        fft_raw = np.abs(np.fft.fft(windowed_data))[:size // 2]
+        return np.log10(fft_raw + 1) * 10
+
+    analyzer = SpectrumAnalyzer(size)
+
+    print(f"FFT size {size}, {iterations} iterations")
+    print_result("legacy fft + hanning", *measure(legacy, iterations))
+    print_result("SpectrumAnalyzer.analyze", *measure(lambda: analyzer.analyze(samples), iterations))
+
+
+def bench_particles(count, frames):
+    """Particle objects vs. ParticleSystem: update + draw per frame on an offscreen surface."""
+    import pygame
+    from particle import Particle, ParticleSystem
+    width, height = 1200, 800
+    screen = pygame.Surface((width, height))
+    life = frames + 10  # everything stays alive for the whole run
+    x = np.random.uniform(0, width, count)
+    y = np.random.uniform(0, height * 0.3, count)
+    vx = np.random.uniform(-1, 1, count)
+    vy = np.random.uniform(-2, 0, count)
+    colors = np.random.randint(0, 256, (count, 3))
+
+    particles = [Particle(*args, life, tuple(color)) for *args, color in
+                 zip(x.tolist(), y.tolist(), vx.tolist(), vy.tolist(), colors.tolist())]
+
+    def legacy():
+        nonlocal particles
+        particles = [p for p in particles if p.update()]
+        for particle in particles:
+            particle.draw(screen)
+
+    system = ParticleSystem(capacity=count)
+    system.spawn(x, y, vx, vy, life, colors)
+
+    def vectorized():
+        system.update()
+        system.draw(screen)
+
+    print(f"{count} particles, {frames} frames")
+    for name, func in (("Particle objects", legacy), ("ParticleSystem", vectorized)):
+        start = time.perf_counter()
+        for _ in range(frames):
+            func()
+        ms_per_frame = (time.perf_counter() - start) / frames * 1000
+        print(f"{name:<28} {ms_per_frame:9.2f} ms/frame {count / ms_per_frame:9.0f} particles/ms")
+
+
+def _decode_child(backend, path, sr, results):
+    """Runs one decoder in a fresh process so ru_maxrss is not shared between backends."""
+    import decoder
+    tracemalloc.start()
+    start = time.perf_counter()
+    if backend == 'ffmpeg blocks':
+        samples = sum(len(block) for block in decoder.iter_audio_blocks(path, sr, sr * 5))
+    elif backend == 'ffmpeg full':
+        samples = len(decoder.decode_audio(path, sr))
+    else:
+        import librosa
+        samples = len(librosa.load(path, sr=sr, mono=True)[0])
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    try:
+        import resource
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        max_rss *= 1 if sys.platform == 'darwin' else 1024  # bytes on macOS, KiB on Linux
+    except ImportError:  # Windows
+        max_rss = 0
+    results.put((backend, samples, elapsed, peak, max_rss))
+
+
+def bench_decode(path, sr):
+    """librosa.load vs. the FFmpeg pipe, each in its own process."""
+    import decoder
+    backends = ['librosa']
+    if decoder.find_decoder_ffmpeg():
+        backends = ['ffmpeg blocks', 'ffmpeg full'] + backends
+    else:
+        print("FFmpeg not found, only librosa is measured.")
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    print(f"Decoding {path} at {sr} Hz")
+    for backend in backends:
+        process = context.Process(target=_decode_child, args=(backend, path, sr, results))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            print(f"{backend:<16} failed (exit code {process.exitcode})")
+            continue
+        name, samples, elapsed, peak, max_rss = results.get()
+        print(f"{name:<16} {elapsed:8.2f} s {samples / sr / max(elapsed, 1e-9):8.1f}x realtime "
+              f"{peak / 1024 ** 2:9.1f} MiB traced peak {max_rss / 1024 ** 2:9.1f} MiB max RSS")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the visualizer hot paths.")
+    subparsers = parser.add_subparsers(dest='command', help='Available benchmarks')
+
+    fft_parser = subparsers.add_parser('fft', help='Live FFT analysis per chunk')
+    fft_parser.add_argument('--size', type=int, default=2048, help="FFT size in samples")
+    fft_parser.add_argument('--iterations', type=int, default=2000)
+
+    particles_parser = subparsers.add_parser('particles', help='Particle update + draw throughput')
+    particles_parser.add_argument('--count', type=int, default=10000)
+    particles_parser.add_argument('--frames', type=int, default=200)
+
+    decode_parser = subparsers.add_parser('decode', help='Audio file decoding: librosa vs. FFmpeg pipe')
+    decode_parser.add_argument('path', help="Audio file to decode")
+    decode_parser.add_argument('--sr', type=int, default=44100, help="Target sample rate")
+
+    args = parser.parse_args()
+
+    if args.command == 'fft':
+        bench_fft(args.size, args.iterations)
+    elif args.command == 'particles':
+        bench_particles(args.count, args.frames)
+    elif args.command == 'decode':
+        bench_decode(args.path, args.sr)
+    else:
+        parser.print_help()
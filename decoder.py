@@ -2,10 +2,12 @@
 # 6. Export functions - merge_video_audio (Automated)
 # File: decoder.py
 # Updated for new system_report.json format with audio device endpoints
+# Also the FFmpeg PCM decoder (decode_audio, iter_audio_blocks) used by FileProcessor
 # -----------------------------------------------------------------------------
 import argparse
 import subprocess
 import os
+import re
 import json
 from datetime import datetime
 
@@ -36,6 +38,120 @@ def get_ffmpeg_path():
     
     return ffmpeg_path
 
+_decoder_ffmpeg = None
+
+def find_decoder_ffmpeg():
+    """FFmpeg for decoding: system_report.json first, then PATH via detector.find_ffmpeg(). None if missing."""
+    global _decoder_ffmpeg
+    if _decoder_ffmpeg is None:
+        try:
+            _decoder_ffmpeg = get_ffmpeg_path()
+        except (FileNotFoundError, ValueError):
+            from detector import find_ffmpeg
+            _decoder_ffmpeg = find_ffmpeg() or ""
+    return _decoder_ffmpeg or None
+
+def _open_pcm_pipe(ffmpeg_path, file_path, sr):
+    """FFmpeg decodes, downmixes to mono and resamples to sr; raw float32 on stdout."""
+    command = [
+        ffmpeg_path,
+        '-v', 'error',
+        '-nostdin',
+        '-i', file_path,
+        '-vn',
+        '-ac', '1',
+        '-ar', str(sr),
+        '-f', 'f32le',
+        '-'
+    ]
+    return subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+def _read_into(stream, buffer):
+    """Fills the float32 buffer from the pipe; returns the number of complete samples read."""
+    view = memoryview(buffer).cast('B')
+    filled = 0
+    while filled < len(view):
+        n = stream.readinto(view[filled:])
+        if not n:
+            break
+        filled += n
+    return filled // 4
+
+def _finish(process):
+    stderr = process.stderr.read().decode('utf-8', 'replace').strip()
+    if process.wait() != 0:
+        raise RuntimeError(f"FFmpeg decode failed: {stderr or process.returncode}")
+
+def iter_audio_blocks(file_path, sr, block_samples, ffmpeg_path=None):
+    """
+    Streams the file as mono float32 blocks of block_samples at sr through an FFmpeg pipe.
+    Each block is read straight into a fresh NumPy array, no intermediate bytes objects.
+    Raises FileNotFoundError without FFmpeg and RuntimeError if FFmpeg fails.
+    """
+    import numpy as np
+    ffmpeg_path = ffmpeg_path or find_decoder_ffmpeg()
+    if not ffmpeg_path:
+        raise FileNotFoundError("FFmpeg not found.")
+    process = _open_pcm_pipe(ffmpeg_path, file_path, sr)
+    try:
+        while True:
+            block = np.empty(block_samples, dtype=np.float32)
+            n = _read_into(process.stdout, block)
+            if n:
+                yield block[:n]
+            if n < block_samples:
+                break
+        _finish(process)
+    finally:
+        if process.poll() is None:  # generator closed early
+            process.kill()
+            process.wait()
+
+def decode_audio(file_path, sr, duration=None, ffmpeg_path=None):
+    """
+    Decodes the whole file into one preallocated float32 array (mono, sr).
+    duration (seconds, e.g. from the container) sizes the buffer; it grows if needed.
+    """
+    import numpy as np
+    ffmpeg_path = ffmpeg_path or find_decoder_ffmpeg()
+    if not ffmpeg_path:
+        raise FileNotFoundError("FFmpeg not found.")
+    capacity = int((duration or 60.0) * sr * 1.01) + sr
+    samples = np.empty(capacity, dtype=np.float32)
+    filled = 0
+    process = _open_pcm_pipe(ffmpeg_path, file_path, sr)
+    try:
+        while True:
+            if filled == len(samples):
+                samples = np.resize(samples, len(samples) * 2)
+            n = _read_into(process.stdout, samples[filled:])
+            filled += n
+            if filled < len(samples):
+                break
+        _finish(process)
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+    return samples[:filled]
+
+def probe_duration(file_path, ffmpeg_path=None):
+    """Duration in seconds from the container, read from FFmpeg's "Duration:" line. None if unknown."""
+    ffmpeg_path = ffmpeg_path or find_decoder_ffmpeg()
+    if not ffmpeg_path:
+        return None
+    try:
+        # without an output file FFmpeg only prints the input info (and exits with an error)
+        result = subprocess.run([ffmpeg_path, '-hide_banner', '-nostdin', '-i', file_path],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=30)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    match = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", result.stderr.decode('utf-8', 'replace'))
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
 def get_audio_devices():
     """Get available audio devices with their endpoints"""
     config = load_system_config()
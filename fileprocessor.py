@@ -4,52 +4,666 @@
 # -----------------------------------------------------------------------------
 import pygame
 import numpy as np
-import librosa
 import threading
 import os
+import time
+import shutil
+import tempfile
+import multiprocessing
+from functools import lru_cache
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from analysiscache import AnalysisCache
+import decoder
+
+class StreamingSTFT:
+    """
+    Blockweise STFT mit derselben Rahmung wie librosa.stft(center=True):
+    Rahmen t ist um Sample t * hop_length zentriert, die Ränder werden mit Nullen aufgefüllt.
+    """
+    def __init__(self, n_fft, hop_length):
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.window = np.hanning(n_fft + 1)[:-1].astype(np.float32)  # periodisches Hann-Fenster wie librosa
+        self.pending = np.zeros(n_fft // 2, dtype=np.float32)         # Center-Padding am Anfang
+
+    def process(self, samples, final=False):
+        """Gibt die Beträge aller vollständigen Rahmen als (frames, bins) zurück."""
+        parts = [self.pending, np.asarray(samples, dtype=np.float32)]
+        if final:
+            parts.append(np.zeros(self.n_fft // 2, dtype=np.float32))
+        buffer = np.concatenate(parts)
+        if len(buffer) < self.n_fft:
+            self.pending = buffer
+            return np.zeros((0, self.n_fft // 2 + 1), dtype=np.float32)
+        n_frames = 1 + (len(buffer) - self.n_fft) // self.hop_length
+        frames = np.lib.stride_tricks.sliding_window_view(buffer, self.n_fft)[::self.hop_length][:n_frames]
+        magnitude = np.abs(np.fft.rfft(frames * self.window, axis=1)).astype(np.float32)
+        self.pending = buffer[n_frames * self.hop_length:]
+        return magnitude
+
+def normalize_frames(db_frames):
+    """
+    Skaliert jeden Rahmen (Zeile) einzeln auf 0..100 wie früher np.interp pro Frame.
+    Gibt (uint8-Rahmen, Level = Mittelwert, Peak = Maximum) zurück.
+    """
+    low = db_frames.min(axis=1, keepdims=True)
+    span = db_frames.max(axis=1, keepdims=True) - low
+    normalized = (db_frames - low) * (100.0 / np.maximum(span, 1e-6))
+    return (np.rint(normalized).astype(np.uint8),
+            normalized.mean(axis=1).astype(np.float32),
+            normalized.max(axis=1).astype(np.float32))
+
+def iter_audio_blocks(file_path, sr, block_seconds, hop_length):
+    """
+    Dekodiert die Datei blockweise (mono, sr, float32).
+    Bevorzugt die FFmpeg-Pipe (dekodiert, mischt und resampelt in einem Schritt), sonst librosa:
+    ohne Resampling per librosa.stream, mit Resampling einmal komplett dekodiert.
+    """
+    block_samples = int(block_seconds * sr)
+    if decoder.find_decoder_ffmpeg():
+        blocks = 0
+        try:
+            for block in decoder.iter_audio_blocks(file_path, sr, block_samples):
+                blocks += 1
+                yield block
+            return
+        except (OSError, RuntimeError) as e:
+            if blocks:  # mitten im Track abgebrochen, librosa würde von vorn beginnen
+                raise
+            print(f"FFmpeg-Dekodierung fehlgeschlagen, nutze librosa: {e}")
+    import librosa  # schwerer Import (numba, scipy): erst bei der ersten Analyse laden
+    try:
+        native_sr = librosa.get_samplerate(file_path)
+    except Exception:
+        native_sr = None
+    if native_sr == sr:
+        # soundfile kann ohne Resampling direkt streamen
+        yield from librosa.stream(file_path, block_length=max(1, block_samples // hop_length),
+                                  frame_length=hop_length, hop_length=hop_length, mono=True)
+        return
+    # audioread kann nicht springen: jedes offset würde wieder vom Dateianfang dekodieren
+    # (quadratische Laufzeit). Daher einmal komplett laden und in Blöcke teilen.
+    print("Hinweis: ohne FFmpeg wird die Datei vollständig in den Speicher dekodiert.")
+    y, _ = librosa.load(file_path, sr=sr, mono=True)
+    for start in range(0, len(y), block_samples):
+        yield y[start:start + block_samples]
+
+def estimate_duration(file_path, default=300.0):
+    """
+    Dauer in Sekunden laut Container, ohne zu dekodieren (über dasselbe FFmpeg wie die
+    Dekodierung, sonst librosa). Dient nur der Fortschrittsanzeige und der Anfangsgröße
+    der Ergebnis-Arrays: ist sie unbekannt, wird default angenommen statt abzubrechen.
+    """
+    if decoder.find_decoder_ffmpeg():
+        duration = decoder.probe_duration(file_path)
+        if duration:
+            return duration
+    try:
+        import librosa
+        try:
+            return librosa.get_duration(path=file_path)
+        except TypeError:  # librosa < 0.10
+            return librosa.get_duration(filename=file_path)
+    except Exception as e:
+        print(f"Dauer von '{os.path.basename(file_path)}' unbekannt ({e!r}), schätze {default:.0f} s.")
+        return default
+
+def frame_magnitudes(y, first, stop, n_fft, hop_length):
+    """
+    Beträge der Rahmen first..stop-1 von y mit derselben Rahmung wie StreamingSTFT,
+    sodass Segmente unabhängig voneinander berechnet werden können.
+    """
+    low = first * hop_length - n_fft // 2
+    high = (stop - 1) * hop_length + n_fft // 2
+    buffer = np.zeros(high - low, dtype=np.float32)
+    a, b = max(low, 0), min(high, len(y))
+    if b > a:
+        buffer[a - low:b - low] = y[a:b]
+    frames = np.lib.stride_tricks.sliding_window_view(buffer, n_fft)[::hop_length]
+    window = np.hanning(n_fft + 1)[:-1].astype(np.float32)
+    return np.abs(np.fft.rfft(frames * window, axis=1)).astype(np.float32)
+
+@lru_cache(maxsize=4)
+def mel_filterbank(sr, n_fft):
+    """Mel-Filterbank für onset_flux, einmal pro Prozess (jeder Pool-Worker baut sie nur beim ersten Segment)."""
+    import librosa
+    return librosa.filters.mel(sr=sr, n_fft=n_fft)
+
+def onset_flux(magnitude, mel_basis, previous_mel=None):
+    """
+    Onset-Stärke wie librosa.onset.onset_strength: positiver Fluss des Mel-Spektrogramms in dB.
+    Gibt (Fluss pro Rahmen, letzte Mel-Zeile für den nächsten Block) zurück.
+    """
+    mel_db = 10 * np.log10(np.maximum(magnitude ** 2 @ mel_basis.T, 1e-10))
+    if previous_mel is not None:
+        mel_db = np.vstack([previous_mel, mel_db])
+    flux = np.maximum(0, np.diff(mel_db, axis=0)).mean(axis=1)
+    if previous_mel is None:
+        flux = np.concatenate([[0.0], flux])
+    return flux.astype(np.float32), mel_db[-1:]
+
+# --- Aufgaben für den Prozess-Pool (Modulebene, damit sie picklebar sind) ---
+
+def _decode_task(file_path, sr, block_seconds, hop_length, wave_path):
+    """Dekodiert in eine rohe float32-Datei; gibt die Anzahl Samples zurück."""
+    samples = 0
+    with open(wave_path, 'wb') as f:
+        for block in iter_audio_blocks(file_path, sr, block_seconds, hop_length):
+            np.asarray(block, dtype=np.float32).tofile(f)
+            f.flush()  # Dateigröße dient als Fortschrittsanzeige
+            samples += len(block)
+    return samples
+
+def _stft_task(wave_path, scratch_path, start, stop, n_fft, hop_length, sr):
+    """STFT eines Segments in die dB-Zwischendatei; gibt (Maximum in dB, Onset-Fluss) zurück."""
+    y = np.memmap(wave_path, dtype=np.float32, mode='r')
+    first = max(start - 1, 0)  # ein Rahmen davor für den Fluss am Segmentanfang
+    magnitude = frame_magnitudes(y, first, stop, n_fft, hop_length)
+    del y
+    db = 20 * np.log10(np.maximum(magnitude, 1e-5))
+    scratch = np.load(scratch_path, mmap_mode='r+')
+    scratch[start:stop] = db[start - first:]
+    scratch.flush()
+    del scratch
+    flux, _ = onset_flux(magnitude, mel_filterbank(sr, n_fft))
+    return float(db.max()), flux[start - first:]
+
+def _normalize_task(scratch_path, frames_path, levels_path, peaks_path, start, stop, ref_db):
+    """Schreibt ein Segment normiert (uint8, Level, Peak) in die Ergebnisdateien."""
+    db = np.load(scratch_path, mmap_mode='r')[start:stop].astype(np.float32)
+    db = np.maximum(db - ref_db, -80.0)  # wie amplitude_to_db(ref=np.max, top_db=80)
+    targets = [np.load(path, mmap_mode='r+') for path in (frames_path, levels_path, peaks_path)]
+    for target, values in zip(targets, normalize_frames(db)):
+        target[start:stop] = values
+        target.flush()
+
+def _beat_task(onset_env, sr, hop_length):
+    import librosa
+    _, beat_frames = librosa.beat.beat_track(onset_envelope=onset_env, sr=sr, hop_length=hop_length)
+    return librosa.frames_to_time(beat_frames, sr=sr, hop_length=hop_length)
+
+class PlaybackClock:
+    """
+    Wiedergabeposition aus gezählten Samples statt aus pygame.mixer.music.get_pos():
+    get_pos() springt in Puffer-Schritten, driftet und kennt die Ausgabelatenz nicht.
+    Die Uhr läuft mit perf_counter in Samples der Mixer-Rate und wird nur weich an
+    get_pos() nachgeführt; die Latenz des Mixer-Puffers wird abgezogen.
+    """
+    RESYNC_SECONDS = 0.1  # größere Abweichung: hart neu setzen
+    SLEW = 0.05           # Anteil der Abweichung, der pro neuem get_pos()-Wert korrigiert wird
+
+    def __init__(self, rate=44100, latency=0.0):
+        self.rate = rate
+        self.latency = latency
+        self.running = False
+        self._anchor = 0.0         # perf_counter() bei Sample 0
+        self._paused_samples = 0
+        self._offset = 0.0         # Startposition, get_pos() zählt ab dem letzten play()
+        self._last_reported = None
+
+    def samples(self):
+        """An das Ausgabegerät übergebene Samples seit Anfang des Tracks."""
+        if not self.running:
+            return self._paused_samples
+        return int((time.perf_counter() - self._anchor) * self.rate)
+
+    def time(self):
+        """Hörbare Position in Sekunden (Latenz abgezogen)."""
+        return max(0.0, self.samples() / self.rate - self.latency)
+
+    def start(self, position=0.0, pos_offset=None):
+        """Startet bei position; pos_offset ist die Position, ab der get_pos() zählt (Standard: position)."""
+        self._anchor = time.perf_counter() - position
+        self._offset = position if pos_offset is None else pos_offset
+        self._last_reported = None
+        self.running = True
+
+    def pause(self):
+        self._paused_samples = self.samples()
+        self.running = False
+
+    def resume(self):
+        self._anchor = time.perf_counter() - self._paused_samples / self.rate
+        self.running = True
+
+    def stop(self):
+        self._paused_samples = 0
+        self.running = False
+
+    def wrapped(self, reported_ms):
+        """True, wenn get_pos() zurückspringt: der Mixer hat einen eingereihten Track begonnen."""
+        return self.running and self._last_reported is not None and 0 <= reported_ms < self._last_reported
+
+    def sync(self, reported_ms):
+        """Führt die Uhr an den Wert von get_pos() heran, sobald dieser sich ändert."""
+        if not self.running or reported_ms < 0 or reported_ms == self._last_reported:
+            return
+        self._last_reported = reported_ms
+        error = (self._offset + reported_ms / 1000.0) - (time.perf_counter() - self._anchor)
+        if abs(error) > self.RESYNC_SECONDS:
+            self._anchor -= error
+        else:
+            self._anchor -= error * self.SLEW
+
+class InlineExecutor:
+    """Ersatz, falls kein Prozess-Pool gestartet werden kann: führt Aufgaben sofort aus."""
+    def submit(self, func, *args):
+        future = Future()
+        try:
+            future.set_result(func(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
 
 class FileProcessor:
-    def __init__(self):
-        pygame.mixer.init()
+    # Alles, was das Ergebnis der Analyse beeinflusst, gehört in den Cache-Schlüssel
+    N_FFT = 2048
+    HOP_LENGTH = 1024
+    ANALYSIS_VERSION = 3
+    # Streaming-Modus: Blockgröße beim Dekodieren, Vorlauf bis zur Wiedergabe, Intervall der Beat-Verfeinerung
+    BLOCK_SECONDS = 5.0
+    LEAD_SECONDS = 2.0
+    BEAT_REFINE_SECONDS = 15.0
+    # Zwischendurch wird nur das Ende des Onset-Verlaufs neu ausgewertet (Aufwand unabhängig von der Tracklänge);
+    # die ersten BEAT_MARGIN Sekunden des Fensters dienen dem Beat-Tracker nur zum Einschwingen
+    BEAT_WINDOW_SECONDS = 60.0
+    BEAT_MARGIN_SECONDS = 10.0
+    # BPM-Anzeige: Beats der letzten BPM_WINDOW Sekunden
+    BPM_WINDOW = 8.0
+    # Mixer-Puffer in Samples (Pygame-2-Standard), bestimmt die Ausgabelatenz der PlaybackClock
+    MIXER_BUFFER = 512
+    # Lückenloser Wechsel: so lange nach dem Trackende auf den Rücksprung von get_pos() warten
+    SWITCH_GRACE = 0.5
+    # Parallele Analyse: Segmentlänge pro STFT-Aufgabe
+    SEGMENT_SECONDS = 30.0
+    _pool = None  # Prozess-Pool, wird über alle Ladevorgänge wiederverwendet
+    _pool_lock = threading.Lock()  # Laden und Playlist-Vorausanalyse laufen in verschiedenen Threads
+
+    def __init__(self, cache=None, use_cache=True, streaming=False, playback=True, pool=None):
+        # playback=False: nur analysieren (z.B. preanalyze.py), ohne Pygame Mixer
+        # streaming=True: blockweise im aufrufenden Thread mit Wiedergabe nach LEAD_SECONDS (interaktives Laden);
+        # sonst gestuft auf dem Prozess-Pool (_analyze_parallel), genutzt für Playlist-Vorausanalyse und preanalyze.py
+        self.playback = playback
+        if playback:
+            pygame.mixer.init(buffer=self.MIXER_BUFFER)
+        mixer_rate = (pygame.mixer.get_init() or (44100,))[0]
+        self.clock = PlaybackClock(mixer_rate, self.MIXER_BUFFER / mixer_rate)
+        # Executor für die parallele Analyse (None = gemeinsamer Prozess-Pool der Klasse)
+        self.pool = pool
+        # streaming=True: Wiedergabe startet nach kurzem Vorlauf, der Rest wird im Hintergrund analysiert
+        self.streaming = streaming
+        # Persistenter Analyse-Cache (None = keine Zwischenspeicherung)
+        self.cache = cache if cache is not None else (AnalysisCache() if use_cache else None)
         self.file_path = None
-        self.log_spectrogram = None
+        # Zeitachse zuerst (frames x bins), vorab auf 0..100 normiert: ein Frame ist eine zusammenhängende Zeile
+        self.frames = None
+        self.frame_levels = None
+        self.frame_peaks = None
+        self.current_level = 0
+        self.peak_level = 0
         self.beat_times = []
         self.duration = 0
         self.sr = 44100
         
-        self.is_analyzed = False
+        self.is_analyzed = False        # genug Daten zum Abspielen vorhanden
+        self.analysis_complete = False  # ganze Datei analysiert
+        self.frames_ready = 0           # fertige Spektrogramm-Spalten
+        self._work_dir = None           # memory-mapped Ergebnisdateien der laufenden Analyse
+        self._work_files = {}
+        self._temp_dir = None           # eigenes Arbeitsverzeichnis, wenn kein Cache genutzt wird
+        self._new_beat_times = None     # verfeinerte Beats aus dem Analyse-Thread
+        self.progress = 0.0             # Fortschritt der laufenden Analyse 0..1 (für die UI)
+        self.progress_stage = ''
+        self.stage_times = {}           # Sekunden pro Analyse-Stufe des letzten Ladevorgangs
+        self._stage_start = None
         self.playback_state = 'stopped'  # Mögliche Zustände: 'stopped', 'playing', 'paused'
         self.beats_detected = 0
         self.beat_index = 0
+        self._frame_buffer = None       # interpolierter Rahmen, wird bei jedem Aufruf wiederverwendet
+        self.next_track = None          # (Pfad, Cache-Eintrag) des per mixer.music.queue eingereihten Tracks
+        self.track_switches = 0         # Zähler der lückenlosen Übergänge (für die Playlist)
+        self._frame_scratch = None
+        self._autoplay = False          # Wiedergabe starten, sobald _mark_ready sie freigibt
 
-    def load_and_analyze(self, file_path):
+    def load_and_analyze(self, file_path, autoplay=False):
         """
         Lädt und analysiert die Audiodatei.
         Diese Methode ist langsam und sollte in einem separaten Thread ausgeführt werden.
+        Mit autoplay startet die Wiedergabe, sobald sie freigegeben ist (im Streaming-Modus
+        nach LEAD_SECONDS, nicht erst am Ende der Analyse).
         """
         try:
             print(f"Lade und analysiere '{os.path.basename(file_path)}'...")
+            start_time = time.perf_counter()
+            self.is_analyzed = False
+            self.analysis_complete = False
+            self._autoplay = autoplay
             self.file_path = file_path
+            self.next_track = None
+            self.stage_times, self.progress_stage = {}, ''
+            self._set_progress('Prüfe Cache', 0.0)
             
-            # --- Librosa Analyse ---
-            audio_data, self.sr = librosa.load(file_path, sr=self.sr, mono=True)
-            self.duration = librosa.get_duration(y=audio_data, sr=self.sr)
+            keys = self.cache_keys(file_path) if self.cache else []
+            cached = next(filter(None, map(self.cache.load, keys)), None) if keys else None
+            key = keys[-1] if keys else None
+            if cached:
+                self._use_cached(*cached)
+                print(f"Analyse aus dem Cache geladen ({(time.perf_counter() - start_time) * 1000:.0f} ms).")
+                self._mark_ready(file_path)
+            else:
+                # eigene Stufe: librosa-Import und Längenbestimmung gehören nicht zur Cache-Prüfung
+                self._set_progress('Vorbereiten', 0.0)
+                self._work_dir = self._open_work_dir()
+                self._work_files = {}
+                # Streaming: Wiedergabe nach LEAD_SECONDS, sonst parallel auf dem Prozess-Pool
+                if self.streaming:
+                    beat_times = self._analyze(file_path, self.LEAD_SECONDS)
+                else:
+                    beat_times = self._analyze_parallel(file_path)
+                np.save(os.path.join(self._work_dir, "beat_times.npy"), beat_times)
+                self._work_files['beat_times'] = "beat_times.npy"
+                if key:
+                    self._set_progress('Speichere', 1.0)
+                    committed = self.cache.commit(key, {'sr': self.sr, 'duration': self.duration,
+                                                        'frame_count': self.frames_ready,
+                                                        'source': os.path.basename(file_path),
+                                                        'params': self.analysis_params(self.normalization)},
+                                                  self._work_dir, self._work_files)
+                    entry = self.cache.load(key) if committed else None
+                    if entry:  # ab jetzt aus dem endgültigen Eintrag lesen
+                        self._use_cached(*entry)
+                    elif not committed:
+                        # nicht gespeichert: weiter aus dem Arbeitsverzeichnis lesen, beim nächsten Laden löschen
+                        self._temp_dir = self._work_dir
+
+            self.analysis_complete = True
+            self._set_progress('Fertig', 1.0)
+            print("Analyse abgeschlossen.")
+        except BrokenProcessPool as e:
+            print(f"Analyse-Prozess abgestürzt: {e}")
+            FileProcessor._pool = None  # beim nächsten Laden neu starten
+            self._abort()
+        except Exception as e:
+            print(f"Fehler bei der Analyse der Datei: {e}")
+            self._abort()
+
+    def _abort(self):
+        """Analyse fehlgeschlagen: eine im Streaming-Modus schon gestartete Wiedergabe anhalten."""
+        self.stop()
+        self.is_analyzed = False
+
+    def _use_cached(self, meta, arrays):
+        """Übernimmt einen Cache-Eintrag; die Arrays bleiben memory-mapped."""
+        count = meta['frame_count']
+        self._close_work_dir()
+        self.sr, self.duration = meta['sr'], meta['duration']
+        self.frames = arrays['frames'][:count]
+        self.frame_levels = arrays['frame_levels'][:count]
+        self.frame_peaks = arrays['frame_peaks'][:count]
+        self.beat_times = arrays['beat_times']
+        self.frames_ready = count
+
+    def _mark_ready(self, file_path):
+        """Bereitet den Pygame Mixer vor und gibt die Wiedergabe frei."""
+        self.playback_state = 'stopped'
+        self.is_analyzed = True
+        if self.playback:
+            pygame.mixer.music.load(file_path)
+            print("Bereit zum Abspielen.")
+            if self._autoplay:
+                self._autoplay = False
+                self.toggle_play_pause()
+
+    @property
+    def normalization(self):
+        """dB-Referenz: Streaming kennt nur das laufende Maximum, die parallele Analyse das globale."""
+        return 'running_max' if self.streaming else 'global_max'
+
+    def analysis_params(self, normalization=None):
+        return {'version': self.ANALYSIS_VERSION, 'sr': self.sr,
+                'n_fft': self.N_FFT, 'hop_length': self.HOP_LENGTH,
+                'normalization': normalization or self.normalization}
+
+    def cache_keys(self, file_path):
+        """
+        Cache-Schlüssel in Suchreihenfolge. Ein global normierter Eintrag (z.B. von
+        preanalyze.py) wird immer bevorzugt; gespeichert wird unter dem letzten Schlüssel.
+        """
+        schemes = ['global_max', self.normalization] if self.streaming else [self.normalization]
+        return [self.cache.make_key(file_path, self.analysis_params(scheme)) for scheme in schemes]
+
+    def _open_work_dir(self):
+        """Verzeichnis für die memory-mapped Ergebnisdateien der laufenden Analyse."""
+        self._close_work_dir()
+        if self.cache:
+            return self.cache.create_work_dir()
+        self._temp_dir = tempfile.mkdtemp(prefix="aav_analysis_")
+        return self._temp_dir
+
+    def _close_work_dir(self):
+        """Löscht das temporäre Verzeichnis der vorherigen Analyse (ohne Cache oder nicht gespeichert)."""
+        if self._temp_dir:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+            self._temp_dir = None
+
+    def _allocate_frames(self, capacity):
+        """Legt die Ergebnis-Arrays als memory-mapped .npy-Dateien im Arbeitsverzeichnis an."""
+        bins = self.N_FFT // 2 + 1
+        self.frames = self._open_memmap('frames', np.uint8, (capacity, bins))
+        self.frame_levels = self._open_memmap('frame_levels', np.float32, (capacity,))
+        self.frame_peaks = self._open_memmap('frame_peaks', np.float32, (capacity,))
+        self.frames_ready = 0
+
+    def _open_memmap(self, name, dtype, shape):
+        # beim Vergrößern eine neue Datei (Kapazität im Namen), die alte ist noch gemappt
+        self._work_files[name] = f"{name}.{shape[0]}.npy" if name in self._work_files else f"{name}.npy"
+        return np.lib.format.open_memmap(os.path.join(self._work_dir, self._work_files[name]),
+                                         mode='w+', dtype=dtype, shape=shape)
+
+    def _grow_frames(self, capacity):
+        """Selten: die geschätzte Dauer war zu kurz, Arrays in größere Dateien umkopieren."""
+        for name in ('frames', 'frame_levels', 'frame_peaks'):
+            old, old_file = getattr(self, name), self._work_files[name]
+            new = self._open_memmap(name, old.dtype, (capacity,) + old.shape[1:])
+            new[:len(old)] = old
+            setattr(self, name, new)
+            del old
+            try:
+                os.remove(os.path.join(self._work_dir, old_file))
+            except OSError:
+                pass  # Windows: noch gemappt, wird mit dem Verzeichnis aufgeräumt
+
+    def _write_frames(self, start, db_frames):
+        """Normiert (frames, bins) dB-Werte und schreibt sie ab Rahmen start."""
+        end = start + len(db_frames)
+        if end > len(self.frames):
+            self._grow_frames(end + len(self.frames) // 4)
+        (self.frames[start:end], self.frame_levels[start:end],
+         self.frame_peaks[start:end]) = normalize_frames(db_frames)
+        self.frames_ready = max(self.frames_ready, end)
+
+    def _iter_blocks(self, file_path):
+        """Dekodiert die Datei blockweise (mono, self.sr, float32)."""
+        return iter_audio_blocks(file_path, self.sr, self.BLOCK_SECONDS, self.HOP_LENGTH)
+
+    def _analyze(self, file_path, lead_seconds=None):
+        """
+        Blockweise Analyse: dekodiert, berechnet die STFT pro Block und schreibt die
+        normierten Rahmen direkt in memory-mapped Dateien. Weder die Wellenform noch
+        die komplette STFT liegen je vollständig im Speicher, der Speicherbedarf ist
+        unabhängig von der Länge des Tracks.
+        Mit lead_seconds wird die Wiedergabe freigegeben, sobald so viel analysiert ist
+        (Streaming-Modus), sonst erst am Ende. Beats werden regelmäßig auf dem
+        bisherigen Onset-Verlauf neu berechnet.
+        Gibt die endgültigen Beat-Zeiten zurück; der Render-Thread übernimmt sie über _new_beat_times.
+        """
+        estimated = estimate_duration(file_path)
+        capacity = int(estimated * 1.01 * self.sr) // self.HOP_LENGTH + 64
+        self._allocate_frames(capacity)
+        self.beat_times = beat_times = np.zeros(0)
+        self.duration = estimated
+        onset_env = np.zeros(capacity, dtype=np.float32)
+        import librosa
+        mel = mel_filterbank(self.sr, self.N_FFT)
+        
+        stft = StreamingSTFT(self.N_FFT, self.HOP_LENGTH)
+        running_max = -np.inf
+        previous_mel = None
+        samples_done = 0
+        next_refine = self.BEAT_REFINE_SECONDS
+        lead_frames = int(lead_seconds * self.sr / self.HOP_LENGTH) if lead_seconds is not None else None
+        
+        self._set_progress('Analysiere', 0.0)
+        blocks = self._iter_blocks(file_path)
+        while True:
+            block = next(blocks, None)
+            final = block is None
+            magnitude = stft.process(block if not final else np.zeros(0), final=final)
+            if block is not None:
+                samples_done += len(block)
+            del block
             
-            _, beat_frames = librosa.beat.beat_track(y=audio_data, sr=self.sr)
-            self.beat_times = librosa.frames_to_time(beat_frames, sr=self.sr)
+            if len(magnitude):
+                db = 20 * np.log10(np.maximum(magnitude, 1e-5))
+                running_max = max(running_max, float(db.max()))
+                db = np.maximum(db - running_max, -80.0)  # wie amplitude_to_db(ref=max, top_db=80), mit laufendem Maximum
+                
+                flux, previous_mel = onset_flux(magnitude, mel, previous_mel)
+                end = self.frames_ready + len(db)
+                if end > len(onset_env):
+                    onset_env = np.concatenate([onset_env, np.zeros(end - len(onset_env) + capacity // 4, dtype=np.float32)])
+                onset_env[end - len(flux):end] = flux
+                self._write_frames(self.frames_ready, db)
+                del magnitude, db
             
-            spectrogram = np.abs(librosa.stft(audio_data, n_fft=2*1024, hop_length=1024))
-            self.log_spectrogram = librosa.amplitude_to_db(spectrogram, ref=np.max)
+            self._set_progress('Analysiere', min(1.0, samples_done / max(estimated * self.sr, 1)))
+            if not self.is_analyzed and lead_frames is not None and (self.frames_ready >= lead_frames or final):
+                self._mark_ready(file_path)
+            if final:
+                # einmal über den ganzen Verlauf
+                _, beat_frames = librosa.beat.beat_track(onset_envelope=onset_env[:self.frames_ready],
+                                                         sr=self.sr, hop_length=self.HOP_LENGTH)
+                beat_times = librosa.frames_to_time(beat_frames, sr=self.sr, hop_length=self.HOP_LENGTH)
+                self._new_beat_times = beat_times
+            elif lead_frames is not None and samples_done / self.sr >= next_refine:
+                beat_times = self._refine_beats(beat_times, onset_env[:self.frames_ready])
+                self._new_beat_times = beat_times
+                next_refine += self.BEAT_REFINE_SECONDS
+            if final:
+                break
+        
+        self.duration = samples_done / self.sr
+        for array in (self.frames, self.frame_levels, self.frame_peaks):
+            array.flush()
+        if not self.is_analyzed:
+            self.beat_times, self._new_beat_times = beat_times, None
+            self._mark_ready(file_path)
+        return beat_times
 
-            # --- Pygame Mixer vorbereiten ---
-            pygame.mixer.music.load(file_path)
+    def _refine_beats(self, beat_times, onset_env):
+        """
+        Beat-Tracking nur über die letzten BEAT_WINDOW_SECONDS des Onset-Verlaufs.
+        Beats vor dem Fenster (plus Einschwingzeit) bleiben, der Rest wird ersetzt.
+        """
+        import librosa
+        window = int(self.BEAT_WINDOW_SECONDS * self.sr / self.HOP_LENGTH)
+        first = max(0, len(onset_env) - window)
+        _, beat_frames = librosa.beat.beat_track(onset_envelope=onset_env[first:],
+                                                 sr=self.sr, hop_length=self.HOP_LENGTH)
+        new_times = librosa.frames_to_time(np.asarray(beat_frames) + first, sr=self.sr, hop_length=self.HOP_LENGTH)
+        cut = librosa.frames_to_time(first, sr=self.sr, hop_length=self.HOP_LENGTH) + self.BEAT_MARGIN_SECONDS if first else 0.0
+        return np.concatenate([beat_times[beat_times < cut], new_times[new_times >= cut]])
 
-            self.is_analyzed = True
-            self.playback_state = 'stopped'
-            print("Analyse abgeschlossen. Bereit zum Abspielen.")
-        except Exception as e:
-            print(f"Fehler bei der Analyse der Datei: {e}")
-            self.is_analyzed = False
+    def _set_progress(self, stage, progress):
+        """Meldet den Fortschritt an die UI und misst nebenbei die Dauer jeder Stufe."""
+        now = time.perf_counter()
+        if stage != self.progress_stage:
+            if self.progress_stage and self._stage_start is not None:
+                elapsed = now - self._stage_start
+                self.stage_times[self.progress_stage] = self.stage_times.get(self.progress_stage, 0.0) + elapsed
+            self._stage_start = now
+        self.progress_stage, self.progress = stage, progress
+
+    @classmethod
+    def _get_pool(cls):
+        """Startet den Prozess-Pool beim ersten Gebrauch; ohne Pool läuft alles im Analyse-Thread."""
+        with cls._pool_lock:
+            if cls._pool is None:
+                try:
+                    # "spawn" statt fork: der Hauptprozess hat bereits SDL- und Audio-Threads
+                    cls._pool = ProcessPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) - 1),
+                                                    mp_context=multiprocessing.get_context("spawn"))
+                except (OSError, NotImplementedError, ValueError) as e:
+                    print(f"Prozess-Pool nicht verfügbar, analysiere im Thread: {e}")
+                    cls._pool = InlineExecutor()
+            return cls._pool
+
+    def _analyze_parallel(self, file_path):
+        """
+        Parallele Analyse in Stufen auf dem Prozess-Pool:
+        1. Dekodieren in eine rohe float32-Datei (Fortschritt über die Dateigröße)
+        2. STFT in Segmenten von SEGMENT_SECONDS, alle Kerne gleichzeitig
+        3. Beat-Tracking auf der Onset-Kurve parallel zur Normierung der Segmente
+        Die Prozesse tauschen nur Dateipfade aus, die Daten liegen memory-mapped im Arbeitsverzeichnis.
+        Gibt die Beat-Zeiten zurück.
+        """
+        pool = self.pool or self._get_pool()
+        wave_path = os.path.join(self._work_dir, "waveform.f32")
+        scratch_path = os.path.join(self._work_dir, "spectrum_db.npy")
+        estimated = estimate_duration(file_path)
+        
+        # 1. Dekodieren (0..30 %)
+        self._set_progress('Dekodiere', 0.0)
+        decoding = pool.submit(_decode_task, file_path, self.sr, self.BLOCK_SECONDS, self.HOP_LENGTH, wave_path)
+        expected_bytes = max(estimated * self.sr * 4, 1)
+        while not wait([decoding], timeout=0.1).done:
+            if os.path.exists(wave_path):
+                self._set_progress('Dekodiere', 0.3 * min(1.0, os.path.getsize(wave_path) / expected_bytes))
+        samples = decoding.result()
+        
+        # 2. STFT-Segmente (30..85 %)
+        frame_count = 1 + samples // self.HOP_LENGTH
+        self._allocate_frames(frame_count)
+        # dB-Zwischenergebnis als float16, wird nach der Normierung gelöscht
+        scratch = np.lib.format.open_memmap(scratch_path, mode='w+', dtype=np.float16,
+                                            shape=(frame_count, self.N_FFT // 2 + 1))
+        del scratch
+        segment = max(1, int(self.SEGMENT_SECONDS * self.sr / self.HOP_LENGTH))
+        segments = [(start, min(start + segment, frame_count)) for start in range(0, frame_count, segment)]
+        
+        self._set_progress('Berechne Spektrum', 0.3)
+        onset_env = np.zeros(frame_count, dtype=np.float32)
+        ref_db = -np.inf
+        tasks = {pool.submit(_stft_task, wave_path, scratch_path, start, stop,
+                             self.N_FFT, self.HOP_LENGTH, self.sr): (start, stop) for start, stop in segments}
+        for done, task in enumerate(as_completed(tasks), 1):
+            start, stop = tasks[task]
+            segment_max, onset_env[start:stop] = task.result()
+            ref_db = max(ref_db, segment_max)
+            self._set_progress('Berechne Spektrum', 0.3 + 0.55 * done / len(tasks))
+        
+        # 3. Beats parallel zur Normierung (85..100 %)
+        beats = pool.submit(_beat_task, onset_env, self.sr, self.HOP_LENGTH)
+        paths = [os.path.join(self._work_dir, self._work_files[name])
+                 for name in ('frames', 'frame_levels', 'frame_peaks')]
+        tasks = [pool.submit(_normalize_task, scratch_path, *paths, start, stop, ref_db) for start, stop in segments]
+        for done, task in enumerate(as_completed(tasks), 1):
+            task.result()
+            self._set_progress('Normiere', 0.85 + 0.15 * done / len(tasks))
+        beat_times = beats.result()
+        
+        for path in (wave_path, scratch_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.frames_ready = frame_count
+        self.duration = samples / self.sr
+        self.beat_times, self._new_beat_times = beat_times, None
+        self._mark_ready(file_path)
+        return beat_times
 
     def toggle_play_pause(self):
         """Wechselt zwischen Play und Pause oder startet die Wiedergabe."""
@@ -58,60 +672,164 @@ class FileProcessor:
 
         if self.playback_state == 'playing':
             pygame.mixer.music.pause()
+            self.clock.pause()
             self.playback_state = 'paused'
             print("Wiedergabe pausiert.")
         elif self.playback_state == 'paused':
             pygame.mixer.music.unpause()
+            self.clock.resume()
             self.playback_state = 'playing'
             print("Wiedergabe fortgesetzt.")
         elif self.playback_state == 'stopped':
             self.beat_index = 0
             self.beats_detected = 0
+            self.next_track = None  # play() verwirft die Warteschlange des Mixers
             pygame.mixer.music.play()
+            self.clock.start()
             self.playback_state = 'playing'
             print("Wiedergabe gestartet.")
 
+    def seek(self, seconds):
+        """
+        Springt an die Position seconds (gestoppt: Wiedergabe startet dort, pausiert: bleibt pausiert).
+        Beat-Zustand wird per Binärsuche neu aufgebaut, nichts wird übersprungen oder nachgezählt.
+        """
+        if not self.is_analyzed:
+            return
+        seconds = min(max(0.0, seconds), max(0.0, self.duration - 0.1))
+        try:
+            pygame.mixer.music.play(start=seconds)
+        except pygame.error as e:  # nicht jedes Format unterstützt Startpositionen
+            print(f"Springen nicht möglich: {e}")
+            return
+        self.clock.start(seconds)
+        self.next_track = None  # play() verwirft die Warteschlange des Mixers
+        if self.playback_state == 'paused':
+            pygame.mixer.music.pause()
+            self.clock.pause()
+        else:
+            self.playback_state = 'playing'
+        self.beat_index = self.beats_detected = int(np.searchsorted(self.beat_times, seconds))
+
+    def seek_relative(self, delta):
+        """Springt delta Sekunden vor (oder zurück bei negativem delta)."""
+        self.seek(self.clock.time() + delta)
+
+    def queue_next(self, file_path, cached):
+        """
+        Reiht einen fertig analysierten Track (Cache-Eintrag aus AnalysisCache.load) ein:
+        der Mixer spielt ihn lückenlos nach dem aktuellen, get_all_audio_data() wechselt
+        die Analyse-Daten im selben Moment.
+        """
+        if self.playback_state == 'stopped' or not self.is_analyzed:
+            return False
+        pygame.mixer.music.queue(file_path)
+        self.next_track = (file_path, cached)
+        return True
+
+    def play_track(self, file_path, cached):
+        """Wechselt sofort zu einem fertig analysierten Track und startet ihn."""
+        self.stop()
+        self._use_cached(*cached)
+        self.file_path = file_path
+        self.analysis_complete = True
+        self._mark_ready(file_path)
+        self.toggle_play_pause()
+
+    def _switch_to_next(self, position, pos_offset=0.0):
+        """
+        Übernimmt den eingereihten Track, sobald der Mixer ihn spielt; position ist die
+        Stelle im neuen Track, pos_offset der Wert, ab dem get_pos() dort zählt.
+        """
+        file_path, cached = self.next_track
+        self._use_cached(*cached)
+        self.file_path = file_path
+        self.next_track = None
+        self.clock.start(max(0.0, position), pos_offset=pos_offset)
+        self.beat_index = self.beats_detected = int(np.searchsorted(self.beat_times, self.clock.time()))
+        self.track_switches += 1
+        print(f"Nächster Track: '{os.path.basename(file_path)}'")
+
     def stop(self):
         """Stoppt die Wiedergabe und setzt sie zurück."""
-        if not self.is_analyzed:
+        self._autoplay = False  # ein noch laufender Ladevorgang (N) startet danach nicht mehr von selbst
+        # nicht an is_analyzed gebunden: nach einem Analysefehler kann die Musik noch laufen
+        if self.playback_state == 'stopped':
             return
         pygame.mixer.music.stop()
+        self.clock.stop()
+        self.next_track = None
         self.playback_state = 'stopped'
         print("Wiedergabe gestoppt.")
 
     def get_all_audio_data(self):
+        reported = pygame.mixer.music.get_pos() if self.playback_state == 'playing' else -1
+        if self.next_track is not None and self.playback_state == 'playing':
+            # Übergang am Mixer erkennen, nicht an der Uhr: die zieht die Latenz ab und erreicht
+            # self.duration nie ganz. Vor sync(), sonst setzt der Rücksprung die Uhr hart auf 0 zurück.
+            if self.clock.wrapped(reported):
+                self._switch_to_next(reported / 1000.0)
+            elif self.clock.samples() / self.clock.rate >= self.duration + self.SWITCH_GRACE:
+                # get_pos() ist nicht zurückgesprungen (zählt weiter ab dem alten Track)
+                self._switch_to_next(self.clock.samples() / self.clock.rate - self.duration, pos_offset=-self.duration)
         if self.playback_state != 'playing' or not pygame.mixer.music.get_busy():
             if self.playback_state == 'playing': # Musik ist von selbst zu Ende
                 self.playback_state = 'stopped'
+                self.clock.stop()
             # Leere Daten zurückgeben, wenn nichts abgespielt wird
-            default_shape = self.log_spectrogram.shape[0] if self.is_analyzed else 1024
+            default_shape = self.frames.shape[1] if self.is_analyzed else 1024
+            self.current_level = self.peak_level = 0
             return np.zeros(default_shape), False, 0, 0
         
-        current_time = pygame.mixer.music.get_pos() / 1000.0
+        self.clock.sync(reported)
+        current_time = self.clock.time()
         
-        if self.duration == 0: return np.zeros(self.log_spectrogram.shape[0]), False, 0, 0
-            
-        frame_index = int(current_time * self.log_spectrogram.shape[1] / self.duration)
-        frame_index = min(max(0, frame_index), self.log_spectrogram.shape[1] - 1)
+        if self.frames_ready == 0: return np.zeros(self.frames.shape[1]), False, 0, 0
         
-        fft_data = self.log_spectrogram[:, frame_index]
-        fft_data = np.interp(fft_data, (fft_data.min(), fft_data.max()), (0, 100))
+        if self._new_beat_times is not None:  # Beats wurden im Hintergrund verfeinert
+            self.beat_times, self._new_beat_times = self._new_beat_times, None
+            self.beat_index = self.beats_detected = int(np.searchsorted(self.beat_times, current_time))
+            
+        # Rahmen t ist um Sample t * HOP_LENGTH zentriert: zwischen den Nachbarn linear interpolieren
+        position = min(max(0.0, current_time * self.sr / self.HOP_LENGTH), self.frames_ready - 1)
+        frame_index = int(position)
+        next_index = min(frame_index + 1, self.frames_ready - 1)
+        weight = position - frame_index
+        fft_data = self._interpolate_frame(frame_index, next_index, weight)
         
-        is_beat = False
-        if self.beat_index < len(self.beat_times) and current_time >= self.beat_times[self.beat_index]:
-            is_beat = True
-            self.beat_index += 1
-            self.beats_detected += 1
+        # Alle seit dem letzten Aufruf überschrittenen Beats auf einmal: höchstens ein Blitz pro Rahmen
+        beat_index = self.beat_index
+        if beat_index < len(self.beat_times) and current_time >= self.beat_times[beat_index]:
+            beat_index = int(np.searchsorted(self.beat_times, current_time, side='right'))
+        is_beat = beat_index > self.beat_index
+        self.beat_index = self.beats_detected = beat_index
             
-        level = np.mean(fft_data)
-        peak = np.max(fft_data)
+        level = self.current_level = ((1 - weight) * self.frame_levels[frame_index]
+                                      + weight * self.frame_levels[next_index])
+        peak = self.peak_level = ((1 - weight) * self.frame_peaks[frame_index]
+                                  + weight * self.frame_peaks[next_index])
         
         return fft_data, is_beat, level, peak
 
+    def _interpolate_frame(self, index, next_index, weight):
+        """(1 - weight) * frames[index] + weight * frames[next_index] in einen festen float32-Puffer."""
+        bins = self.frames.shape[1]
+        if self._frame_buffer is None or len(self._frame_buffer) != bins:
+            self._frame_buffer = np.empty(bins, dtype=np.float32)
+            self._frame_scratch = np.empty(bins, dtype=np.float32)
+        np.multiply(self.frames[index], np.float32(1 - weight), out=self._frame_buffer)
+        np.multiply(self.frames[next_index], np.float32(weight), out=self._frame_scratch)
+        np.add(self._frame_buffer, self._frame_scratch, out=self._frame_buffer)
+        return self._frame_buffer
+
     def get_beat_stats(self):
-        current_time = pygame.mixer.music.get_pos() / 1000.0
-        if current_time > 0 and self.beats_detected > 0:
-            bpm = self.beats_detected / (current_time / 60)
-        else:
-            bpm = 0
-        return self.beats_detected, int(bpm)
+        """(Beats bis zur aktuellen Position, BPM aus den Beats der letzten BPM_WINDOW Sekunden)."""
+        current_time = self.clock.time()
+        first = int(np.searchsorted(self.beat_times, current_time - self.BPM_WINDOW))
+        last = self.beat_index - 1
+        bpm = 0
+        if last > first:
+            span = self.beat_times[last] - self.beat_times[first]
+            if span > 0:
+                bpm = (last - first) * 60 / span
+        return self.beats_detected, int(round(bpm))
@@ -2,51 +2,51 @@
 #     Awesome-Audio-Visualizer 1.0.1 by Volkan Sah
 # -----------------------------------------------------------------------------
 # https://github.com/VolkanSah/Awesome-Audio-Visualizer/
+import sys
+from startup import StartupReport
+startup_report = StartupReport.from_argv(sys.argv)  # python main.py --startup-report
 import pygame
 import os
-import sys
 import numpy as np
-import pyaudio
-import math
-import random
-import colorsys
 from collections import deque
 import threading
 import time
 import os
 from datetime import datetime
-import tkinter as tk
-from tkinter import filedialog
-import librosa
-import librosa.display
+# tkinter, subprocess and wave are imported on first use (file dialog, export),
+# librosa inside fileprocessor.py: live mode starts without them
 
 # new
-import subprocess
-from queue import Queue
-import wave
+from queue import Queue, Empty
 
 
 # import dependence
 # -----------------------------------------------------------------------------
 # 1. Audio Component:  class AudioDeviceManager, AudioProcessor in audio.py
 # -----------------------------------------------------------------------------
-from audio import AudioDeviceManager , AudioProcessor
+from audio import AudioSession , AudioDeviceManager , AudioProcessor , BandMapper
 # -----------------------------------------------------------------------------
 # 2. Audio FileProcessor: class FileProcessor in fileprocessor.py
 # -----------------------------------------------------------------------------
 from fileprocessor import FileProcessor
+from playlist import Playlist
 # -----------------------------------------------------------------------------------------------
 # 3. Management and UI Components : class SettingsManager, UIManager in mui.py
 # -----------------------------------------------------------------------------------------------
 from mui import SettingsManager , UIManager , ScreenshotManager
 # -----------------------------------------------------------------------------
-# 4. Visualizer Effects - class Particle in particle.py
+# 4. Visualizer Effects - class ParticleSystem in particle.py
+# -----------------------------------------------------------------------------
+from particle import ParticleSystem
 # -----------------------------------------------------------------------------
-from particle import Particle
+# 12. Color Palettes - class PaletteManager in palette.py
+# -----------------------------------------------------------------------------
+from palette import PaletteManager
 # -----------------------------------------------------------------------------
 # 6. Export functions - merge_video_audio , merge_video_audio in decoder.py
 # -----------------------------------------------------------------------------
 from decoder import merge_video_audio , merge_video_audio
+if startup_report: startup_report.mark("imports done")
 # -----------------------------------------------------------------------------
 # import dependence end start main app core below
 # -----------------------------------------------------------------------------
@@ -75,188 +75,220 @@ class HotVisualizer:
         # Visualizer State
         self.time = 0
         self.beat_flash = 0
-        self.particles = []
+        self.particles = ParticleSystem(capacity=16384)  # fixed pool, extra spawns are dropped
         self.mode = 0
         self.mode_names = ["Circular Bars", "Waveform Tunnel", "Frequency Spiral", "Beat Explosion", "Matrix Rain"]
-        self.color_palette_index = 0
-        self.palettes = ["fire", "electric", "ocean", "rainbow", "neon"]
+        self.palette = PaletteManager()  # built-in palettes plus palettes.json
+        # All draw modes reduce the spectrum through the same cached band matrices
+        self.band_mapper = BandMapper()
+        self.band_layout_index = 0
+        self.sample_rate = 44100
+        # Bar density for Circular Bars / Frequency Spiral (+/- keys), 1.0 = 120 bars / 200 points
+        self.density = 1.0
+        self.density_range = (0.25, 16.0)
+        self._geometry = {}      # (mode, count) -> cached angle tables
         
         # Effects state
         self.fps_history = deque(maxlen=60)
-        self.tunnel_points = []
-        self.matrix_drops = []
+        # Waveform tunnel history: fixed ring of `depth` rings x `points` band values
+        self.tunnel_depth, self.tunnel_size = 50, 40
+        self.tunnel_rings = np.zeros((self.tunnel_depth, self.tunnel_size))
+        self.tunnel_head = 0     # next row to overwrite
+        self.tunnel_count = 0    # rows filled so far
+        self.matrix_levels = 64  # brightness steps of Matrix Rain, one tinted glyph atlas each
         self.init_matrix()
 
         # AUDIO-MODUS-STATUS
         self.audio_mode = "live"
-        self.audio_processor = AudioProcessor(self.device_manager.get_default_device())
-        self.file_processor = FileProcessor()
+        default_device = self.device_manager.get_default_device()
+        self.audio_processor = AudioProcessor(default_device, capture_mode="callback", fft_size=4096, hop_size=512,
+                                              channels=self.device_manager.get_device_channels(default_device))
+        # streaming: playback after LEAD_SECONDS; the process pool only serves prefetch and preanalyze.py
+        self.file_processor = FileProcessor(streaming=True)
+        self.playlist = None
         self.loading_thread = None
 
-    def _load_file_task(self, file_path):
+    def _load_file_task(self, file_path, autoplay=False):
         """Diese Funktion wird im Hintergrund-Thread ausgeführt, um eine Datei zu analysieren."""
-        self.file_processor.load_and_analyze(file_path)
+        self.file_processor.load_and_analyze(file_path, autoplay=autoplay)  # spielt ab, sobald der Anfang analysiert ist
+        if self.playlist: self.playlist.start_prefetch()  # nächste Tracks im Hintergrund analysieren
         self.loading_thread = None # Signalisiert, dass das Laden beendet ist
 
     def init_matrix(self):
-        for x in range(0, self.screen_width, 20):
-            self.matrix_drops.append({
-                'x': x, 'y': random.randint(-500, 0),
-                'speed': random.uniform(2, 8),
-                'chars': [chr(random.randint(33, 126)) for _ in range(20)]
-            })
-
-    def get_color(self, intensity, palette_name):
-        intensity = max(0, min(1, intensity))
-        if palette_name == "fire":
-            if intensity < 0.3: r = int(255 * intensity / 0.3); return (r, 0, 0)
-            elif intensity < 0.6: g = int(255 * (intensity - 0.3) / 0.3); return (255, g, 0)
-            else: b = int(255 * (intensity - 0.6) / 0.4); return (255, 255, b)
-        elif palette_name in ["electric", "ocean", "rainbow", "neon"]:
-            h = {"electric": 0.6 - intensity * 0.15, "ocean": 0.5 + intensity * 0.1,
-                 "rainbow": intensity, "neon": 0.8 - intensity * 0.3}[palette_name]
-            s = {"ocean": 1.0 - intensity * 0.3}.get(palette_name, 1.0)
-            v = {"ocean": 0.3 + intensity * 0.7}.get(palette_name, 1.0)
-            rgb = colorsys.hsv_to_rgb(h, s, v)
-            return tuple(int(c * 255) for c in rgb)
-        return (255, 255, 255)
+        # one drop per 20 px column, 20 characters each (stored as code points)
+        self.matrix_x = np.arange(0, self.screen_width, 20)
+        drops = len(self.matrix_x)
+        self.matrix_y = np.random.randint(-500, 1, drops).astype(float)
+        self.matrix_speed = np.random.uniform(2, 8, drops)
+        self.matrix_chars = np.random.randint(33, 127, (drops, 20))
+        self.matrix_offsets = np.arange(20) * 20
+
+    def get_color(self, intensity, palette_name=None):
+        """Single color from the palette lookup tables (default: current palette)."""
+        return self.palette.color(intensity, palette_name)
+
+    def colors_for(self, intensities):
+        """Vectorized get_color for the current palette: RGB lists ready for the draw calls."""
+        return self.palette.colors_for(intensities).tolist()
+
+    def get_bands(self, fft_data, bands):
+        """Reduces the spectrum to `bands` values using the current band layout."""
+        layout = BandMapper.LAYOUTS[self.band_layout_index]
+        return self.band_mapper.map(fft_data, bands, self.sample_rate, layout)
 # ----------------------------------------  draw_mode _x easyl mod this sections or ad more! ---------------------------------------------
     def draw_mode_0_circular_bars(self, fft_data):
         center_x, center_y = self.screen_width // 2, self.screen_height // 2
-        bars = 120
-        chunk_size = len(fft_data) // bars
-        reduced_fft = [np.mean(fft_data[i:i+chunk_size]) for i in range(0, len(fft_data), chunk_size)][:bars]
-        for i, amplitude in enumerate(reduced_fft):
-            angle = (i / bars) * 2 * math.pi
-            inner_radius = 80 + math.sin(self.time * 0.02 + i * 0.1) * 20
-            outer_radius = inner_radius + amplitude * 0.5
-            inner_x, inner_y = center_x + inner_radius * math.cos(angle), center_y + inner_radius * math.sin(angle)
-            outer_x, outer_y = center_x + outer_radius * math.cos(angle), center_y + outer_radius * math.sin(angle)
-            intensity = min(1, amplitude / 100)
-            color = self.get_color(intensity, self.palettes[self.color_palette_index])
-            width = max(1, int(3 + amplitude * 0.02))
-            pygame.draw.line(self.screen, color, (inner_x, inner_y), (outer_x, outer_y), width)
+        bars = int(120 * self.density)
+        geometry = self._geometry.get((0, bars))
+        if geometry is None:
+            angles = np.arange(bars) / bars * 2 * np.pi
+            geometry = self._geometry[(0, bars)] = (np.cos(angles), np.sin(angles), np.arange(bars) * 0.1)
+        cos, sin, wobble = geometry
+        
+        amplitude = self.get_bands(fft_data, bars)
+        inner_radius = 80 + np.sin(self.time * 0.02 + wobble) * 20
+        outer_radius = inner_radius + amplitude * 0.5
+        inner_x, inner_y = (center_x + inner_radius * cos).tolist(), (center_y + inner_radius * sin).tolist()
+        outer_x, outer_y = (center_x + outer_radius * cos).tolist(), (center_y + outer_radius * sin).tolist()
+        colors = self.colors_for(amplitude / 100)
+        widths = np.maximum(1, (3 + amplitude * 0.02).astype(int)).tolist()
+        for x0, y0, x1, y1, color, width in zip(inner_x, inner_y, outer_x, outer_y, colors, widths):
+            pygame.draw.line(self.screen, color, (x0, y0), (x1, y1), width)
 
     def draw_mode_1_waveform_tunnel(self, fft_data):
         center_x, center_y = self.screen_width // 2, self.screen_height // 2
-        self.tunnel_points.append(fft_data[:200:5])
-        if len(self.tunnel_points) > 50: self.tunnel_points.pop(0)
-        for z, ring in enumerate(self.tunnel_points):
-            z_scale = 1 - z / len(self.tunnel_points)
-            if z_scale <= 0: continue
-            for i, amplitude in enumerate(ring):
-                angle = (i / len(ring)) * 2 * math.pi
-                radius = 50 + amplitude * 0.3 * z_scale
-                x = center_x + radius * math.cos(angle) * z_scale
-                y = center_y + radius * math.sin(angle) * z_scale
-                intensity = amplitude / 100 * z_scale
-                color = self.get_color(intensity, self.palettes[self.color_palette_index])
-                size = max(1, int(3 * z_scale))
-                pygame.draw.circle(self.screen, color, (int(x), int(y)), size)
+        depth, points = self.tunnel_depth, self.tunnel_size
+        if self.tunnel_rings.shape != (depth, points):
+            self.tunnel_rings = np.zeros((depth, points)); self.tunnel_head = self.tunnel_count = 0
+        geometry = self._geometry.get((1, points))
+        if geometry is None:
+            angles = np.arange(points) / points * 2 * np.pi
+            geometry = self._geometry[(1, points)] = (np.cos(angles), np.sin(angles))
+        cos, sin = geometry
+        
+        self.tunnel_rings[self.tunnel_head] = self.get_bands(fft_data, points)
+        self.tunnel_head = (self.tunnel_head + 1) % depth
+        self.tunnel_count = min(self.tunnel_count + 1, depth)
+        # oldest ring first (full scale), newest ring last (smallest)
+        rings = self.tunnel_count
+        amplitude = self.tunnel_rings[(self.tunnel_head - rings + np.arange(rings)) % depth]
+        z_scale = (1 - np.arange(rings) / rings)[:, None]
+        radius = (50 + amplitude * 0.3 * z_scale) * z_scale
+        x = (center_x + radius * cos).astype(int).ravel().tolist()
+        y = (center_y + radius * sin).astype(int).ravel().tolist()
+        colors = self.colors_for((amplitude * (z_scale / 100)).ravel())
+        sizes = np.repeat(np.maximum(1, (3 * z_scale[:, 0]).astype(int)), points).tolist()
+        for px, py, color, size in zip(x, y, colors, sizes):
+            pygame.draw.circle(self.screen, color, (px, py), size)
 
     def draw_mode_2_frequency_spiral(self, fft_data):
         center_x, center_y = self.screen_width // 2, self.screen_height // 2
-        for i, amplitude in enumerate(fft_data[::5]):
-            angle = i * 0.2 + self.time * 0.05
-            radius = 20 + i * 0.8 + amplitude * 0.1
-            x = center_x + radius * math.cos(angle)
-            y = center_y + radius * math.sin(angle)
-            if 0 <= x < self.screen_width and 0 <= y < self.screen_height:
-                intensity = amplitude / 100
-                color = self.get_color(intensity, self.palettes[self.color_palette_index])
-                size = max(1, int(2 + amplitude * 0.05))
-                pygame.draw.circle(self.screen, color, (int(x), int(y)), size)
+        points = int(200 * self.density)
+        geometry = self._geometry.get((2, points))
+        if geometry is None:
+            # more points follow the same spiral more densely
+            step = np.arange(points) * (200 / points)
+            geometry = self._geometry[(2, points)] = (step * 0.2, 20 + step * 0.8)
+        base_angle, base_radius = geometry
+        
+        amplitude = self.get_bands(fft_data, points)
+        angle = base_angle + self.time * 0.05
+        radius = base_radius + amplitude * 0.1
+        x = center_x + radius * np.cos(angle)
+        y = center_y + radius * np.sin(angle)
+        visible = (x >= 0) & (x < self.screen_width) & (y >= 0) & (y < self.screen_height)
+        amplitude = amplitude[visible]
+        colors = self.colors_for(amplitude / 100)
+        sizes = np.maximum(1, (2 + amplitude * 0.05).astype(int)).tolist()
+        for px, py, color, size in zip(x[visible].astype(int).tolist(), y[visible].astype(int).tolist(), colors, sizes):
+            pygame.draw.circle(self.screen, color, (px, py), size)
 
     def draw_mode_3_beat_explosion(self, fft_data, beat_detected):
         if beat_detected:
             center_x, center_y = self.screen_width // 2, self.screen_height // 2
-            for _ in range(30):
-                angle = random.uniform(0, 2 * math.pi)
-                speed = random.uniform(5, 15)
-                vx, vy = speed * math.cos(angle), speed * math.sin(angle)
-                color = self.get_color(random.random(), self.palettes[self.color_palette_index])
-                self.particles.append(Particle(center_x, center_y, vx, vy, 120, color))
+            angle = np.random.uniform(0, 2 * np.pi, 30)
+            speed = np.random.uniform(5, 15, 30)
+            self.particles.spawn(center_x, center_y, speed * np.cos(angle), speed * np.sin(angle), 120,
+                                 self.palette.colors_for(np.random.random(30)))
             self.beat_flash = 30
         
-        bar_width = self.screen_width // min(len(fft_data), 100) if len(fft_data) > 0 else self.screen_width
-        for i, amplitude in enumerate(fft_data[:100]):
+        bars = 100
+        bar_width = self.screen_width // bars
+        amplitudes = self.get_bands(fft_data, bars)
+        for i, (amplitude, color) in enumerate(zip(amplitudes.tolist(), self.colors_for(amplitudes / 100))):
             bar_height = amplitude * 2
             x, y = i * bar_width, self.screen_height - bar_height
-            intensity = amplitude / 100
-            color = self.get_color(intensity, self.palettes[self.color_palette_index])
             pygame.draw.rect(self.screen, color, (x, y, bar_width - 1, bar_height))
         
         if self.beat_flash > 0:
-            overlay = pygame.Surface((self.screen_width, self.screen_height)); overlay.set_alpha(self.beat_flash * 3); overlay.fill((255, 255, 255)); self.screen.blit(overlay, (0, 0))
+            self.screen.blit(self.ui.overlay((255, 255, 255), self.beat_flash * 3), (0, 0))
             self.beat_flash -= 1
 
     def draw_mode_4_matrix_rain(self, fft_data):
-        for drop in self.matrix_drops:
-            drop['y'] += drop['speed']
-            if drop['y'] > self.screen_height:
-                drop['y'], drop['speed'] = random.randint(-200, -50), random.uniform(2, 8)
+        self.matrix_y += self.matrix_speed
+        respawn = self.matrix_y > self.screen_height
+        count = int(np.count_nonzero(respawn))
+        if count:
+            self.matrix_y[respawn] = np.random.randint(-200, -49, count)
+            self.matrix_speed[respawn] = np.random.uniform(2, 8, count)
+        
+        brightness = np.minimum(255, self.get_bands(fft_data, len(self.matrix_x)) * 2)
+        # alpha per (drop, character): trail fade capped by the column brightness, quantized to the tint levels
+        fade = np.maximum(0, 255 - np.arange(self.matrix_chars.shape[1]) * 12)
+        levels = self.matrix_levels - 1
+        level = np.rint(np.minimum(fade[None, :], brightness[:, None]) * (levels / 255)).astype(int)
+        level_colors = self.colors_for(np.arange(self.matrix_levels) / levels)
         
-        for i, drop in enumerate(self.matrix_drops):
-            fft_index = i % len(fft_data) if len(fft_data) > 0 else 0
-            brightness = min(255, fft_data[fft_index] * 2) if len(fft_data) > 0 else 50
-            for j, char in enumerate(drop['chars']):
-                y = drop['y'] + j * 20
-                if 0 <= y < self.screen_height:
-                    alpha = max(0, 255 - j * 12)
-                    alpha = min(alpha, brightness)
-                    color = self.get_color(alpha / 255, self.palettes[self.color_palette_index])
-                    text = self.ui.small_font.render(char, True, color)
-                    self.screen.blit(text, (drop['x'], y))
+        y = self.matrix_y[:, None] + self.matrix_offsets
+        drop, row = np.nonzero((y >= 0) & (y < self.screen_height))
+        atlas = self.ui.glyph_atlas
+        self.screen.blits([(atlas.tinted(level_colors[l]), (x, py), atlas.rect(code)) for x, py, l, code in
+                           zip(self.matrix_x[drop].tolist(), y[drop, row].astype(int).tolist(),
+                               level[drop, row].tolist(), self.matrix_chars[drop, row].tolist())],
+                          doreturn=False)
 # ----------------------------------------  draw_mode _x end ---------------------------------------------
 # ----------------------------------------  update class Particles stored in particles.py ----------------
 
     def update_particles(self):
-        self.particles = [p for p in self.particles if p.update()]
-        for particle in self.particles:
-            particle.draw(self.screen)
+        self.particles.update((self.screen_width, self.screen_height))
+        self.particles.draw(self.screen)
 
     def draw_ui(self, audio_processor):
         current_fps = self.clock.get_fps()
         self.fps_history.append(current_fps)
         avg_fps = np.mean(self.fps_history) if self.fps_history else 0
         
-        mode_text = f"Mode: {self.mode_names[self.mode]} | Palette: {self.palettes[self.color_palette_index]}"
-        text = self.font.render(mode_text, True, (255, 255, 255))
-        self.screen.blit(text, (10, 10))
+        mode_text = f"Mode: {self.mode_names[self.mode]} | Palette: {self.palette.current} | Bands: {BandMapper.LAYOUTS[self.band_layout_index]}"
+        self.ui.hud('mode').draw(self.screen, [(mode_text, (255, 255, 255), 36, (10, 10))])
         
         if self.settings.show_audio_info and audio_processor:
             beats, bpm = audio_processor.get_beat_stats()
-            if self.audio_mode == "live":
-                level, peak, sensitivity = audio_processor.current_level, audio_processor.peak_level, audio_processor.beat_sensitivity
-            else: # File Mode
-                _, _, level, peak = audio_processor.get_all_audio_data()
-                sensitivity = 0.0
+            level, peak = audio_processor.current_level, audio_processor.peak_level
+            sensitivity = audio_processor.beat_sensitivity if self.audio_mode == "live" else 0.0
             self.ui.draw_audio_level_meter(level, peak, 10, 50)
             self.ui.draw_beat_info(beats, bpm, sensitivity, 10, 90)
         
         if self.settings.show_fps:
             fps_text = f"FPS: {avg_fps:.1f}"
-            fps_surface = self.font.render(fps_text, True, (255, 255, 0))
-            self.screen.blit(fps_surface, (self.screen_width - 120, 10))
+            self.ui.hud('fps').draw(self.screen, [(fps_text, (255, 255, 0), 36, (self.screen_width - 120, 10))])
         
-        if self.loading_thread and self.loading_thread.is_alive():
-            loading_surf = self.font.render("Analysiere Audio...", True, (255, 255, 0))
+        if self.loading_thread and self.loading_thread.is_alive() and not self.file_processor.is_analyzed:
+            progress = self.file_processor.progress
+            loading_surf = self.ui.text.render(f"{self.file_processor.progress_stage}... {progress * 100:.0f}%", (255, 255, 0), 36)
             loading_rect = loading_surf.get_rect(center=(self.screen_width / 2, self.screen_height / 2))
             self.screen.blit(loading_surf, loading_rect)
             
         if not self.ui.show_settings and not self.ui.show_device_menu:
-            controls1 = "TAB: Settings | SPACE: Mode | C: Colors | S: Screenshot | F: Fullscreen | ESC: Exit"
-            text1 = pygame.font.Font(None, 20).render(controls1, True, (200, 200, 200))
-            self.screen.blit(text1, (10, self.screen_height - 45))
+            controls1 = "TAB: Settings | SPACE: Mode | C: Colors | B: Bands | S: Screenshot | F: Fullscreen | ESC: Exit"
 
             if self.audio_mode == 'live':
                 controls2 = "MODE: Live | A: Load File | D: Devices | Q/W: Beat Sens."
             else:
                 state = self.file_processor.playback_state.capitalize() if self.file_processor.is_analyzed else "Loading..."
-                controls2 = f"MODE: File ({state}) | L: To Live | P: Play/Pause | K: Stop"
+                controls2 = f"MODE: File ({state}) | L: To Live | P: Play/Pause | K: Stop | Left/Right: Seek | N: Next"
             
-            text2 = pygame.font.Font(None, 20).render(controls2, True, (200, 200, 200))
-            self.screen.blit(text2, (10, self.screen_height - 25))
+            self.ui.hud('controls').draw(self.screen, [(controls1, (200, 200, 200), 20, (10, self.screen_height - 45)),
+                                                       (controls2, (200, 200, 200), 20, (10, self.screen_height - 25))])
 # ----------------------------------------  end class Particles stored in particles.py ----------------
 
     def run(self):
@@ -277,7 +309,12 @@ class HotVisualizer:
                     elif event.key == pygame.K_r: self.export_manager.start_recording()
                     elif event.key == pygame.K_e: self.export_manager.stop_recording("my_awesome_visualizer_video.mp4")
                     elif event.key == pygame.K_SPACE and not self.ui.show_settings and not self.ui.show_device_menu: self.mode = (self.mode + 1) % len(self.mode_names)
-                    elif event.key == pygame.K_c and not self.ui.show_settings and not self.ui.show_device_menu: self.color_palette_index = (self.color_palette_index + 1) % len(self.palettes)
+                    elif event.key == pygame.K_c and not self.ui.show_settings and not self.ui.show_device_menu: self.palette.next()
+                    elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS, pygame.K_MINUS, pygame.K_KP_MINUS) and not self.ui.show_settings and not self.ui.show_device_menu:
+                        factor = 0.5 if event.key in (pygame.K_MINUS, pygame.K_KP_MINUS) else 2.0
+                        self.density = min(max(self.density * factor, self.density_range[0]), self.density_range[1])
+                        print(f"Bar density: {self.density:g}x ({int(120 * self.density)} bars)")
+                    elif event.key == pygame.K_b and not self.ui.show_settings and not self.ui.show_device_menu: self.band_layout_index = (self.band_layout_index + 1) % len(BandMapper.LAYOUTS)
                     elif event.key == pygame.K_f:
                         fullscreen = not fullscreen
                         self.screen = pygame.display.set_mode((0,0) if fullscreen else (1200, 800), pygame.FULLSCREEN if fullscreen else 0)
@@ -297,31 +334,46 @@ class HotVisualizer:
                     elif event.key == pygame.K_a:
                         if not (self.loading_thread and self.loading_thread.is_alive()):
                             if self.audio_mode == "live": self.audio_processor.stop()
+                            import tkinter as tk
+                            from tkinter import filedialog
                             root = tk.Tk(); root.withdraw()
-                            file_path = filedialog.askopenfilename(filetypes=[("Audio Files", "*.mp3 *.wav *.ogg")])
-                            if file_path:
+                            file_paths = filedialog.askopenfilenames(filetypes=[("Audio Files", "*.mp3 *.wav *.ogg")])
+                            if file_paths:
                                 self.audio_mode = "file"
-                                self.loading_thread = threading.Thread(target=self._load_file_task, args=(file_path,))
+                                self.file_processor.stop()
+                                self.playlist = Playlist(self.file_processor, file_paths)
+                                self.loading_thread = threading.Thread(target=self._load_file_task, args=(self.playlist.current(),))
                                 self.loading_thread.start()
                             else:
                                 if self.audio_mode != "live": self.audio_mode = "live"; self.audio_processor.start_stream()
                     elif event.key == pygame.K_p and self.audio_mode == "file" and self.file_processor.is_analyzed: self.file_processor.toggle_play_pause()
-                    elif event.key == pygame.K_k and self.audio_mode == "file" and self.file_processor.is_analyzed: self.file_processor.stop()
+                    elif event.key == pygame.K_k and self.audio_mode == "file": self.file_processor.stop()
+                    elif event.key == pygame.K_n and self.audio_mode == "file" and self.playlist and not (self.loading_thread and self.loading_thread.is_alive()):
+                        next_path = self.playlist.skip()
+                        if next_path:  # noch nicht vorab analysiert
+                            self.loading_thread = threading.Thread(target=self._load_file_task, args=(next_path, True))
+                            self.loading_thread.start()
+                    elif event.key in (pygame.K_LEFT, pygame.K_RIGHT) and self.audio_mode == "file" and self.file_processor.is_analyzed:
+                        step = 30 if pygame.key.get_mods() & pygame.KMOD_SHIFT else 5
+                        self.file_processor.seek_relative(step if event.key == pygame.K_RIGHT else -step)
                     elif self.ui.show_device_menu:
                         if event.key == pygame.K_UP: self.ui.selected_menu_item = max(0, self.ui.selected_menu_item - 1)
                         elif event.key == pygame.K_DOWN: self.ui.selected_menu_item = min(len(self.device_manager.devices) - 1, self.ui.selected_menu_item + 1)
                         elif event.key == pygame.K_RETURN:
                             if self.ui.selected_menu_item < len(self.device_manager.devices):
                                 new_idx = self.device_manager.devices[self.ui.selected_menu_item]['index']
-                                self.audio_processor.change_device(new_idx); self.ui.show_device_menu = False
+                                self.audio_processor.change_device(new_idx, self.device_manager.get_device_channels(new_idx)); self.ui.show_device_menu = False
             
             if self.audio_mode == "live":
                 fft_data, beat_detected, _, _ = self.audio_processor.get_all_audio_data()
                 active_processor = self.audio_processor
+                self.sample_rate = self.audio_processor.rate
             else:
+                if self.playlist: self.playlist.update()  # lückenloser Übergang zum nächsten Track
                 if self.file_processor and self.file_processor.is_analyzed: fft_data, beat_detected, _, _ = self.file_processor.get_all_audio_data()
                 else: fft_data, beat_detected = np.zeros(1024), False
                 active_processor = self.file_processor
+                self.sample_rate = self.file_processor.sr
             
             self.screen.fill((10, 10, 20))
             
@@ -340,11 +392,14 @@ class HotVisualizer:
             self.export_manager.capture_frame(self.screen)
             
             pygame.display.flip()
+            if startup_report and self.time == 0:
+                startup_report.mark("first frame")
+                startup_report.print_report()
             self.clock.tick(60)
             self.time += 1
             
 
-        self.audio_processor.stop()
+        self.audio_processor.close()
         if self.file_processor: self.file_processor.stop()
         self.device_manager.close()
         pygame.quit()
@@ -381,6 +436,7 @@ class ExportManager:
         self.frame_count = 0
 
         # Starte den FFmpeg-Prozess für die Videoaufnahme
+        import subprocess
         cmd = [
             'ffmpeg', '-y',
             '-f', 'rawvideo',
@@ -403,36 +459,52 @@ class ExportManager:
         
     def _record_audio_task(self):
         """Separate thread to record audio to a temporary WAV file."""
+        import wave
+        session = AudioSession.acquire()
+        shared = None
         try:
-            p = pyaudio.PyAudio()
-            audio_format = pyaudio.paInt16
-            channels = 2 # Stereo
-            rate = 44100
-            chunk = 1024
+            # Share the visualizer's input stream instead of opening the device a second time
+            processor = self.visualizer.audio_processor
+            audio_format = processor.format
+            # same channel count as the processor (not fixed stereo), otherwise the stream could not be shared
+            channels = processor.channels
+            rate = processor.rate
+            chunks = Queue()
+            
+            def collect(in_data, frame_count, time_info, status):
+                chunks.put(in_data)
             
-            stream = p.open(format=audio_format,
-                            channels=channels,
-                            rate=rate,
-                            input=True,
-                            frames_per_buffer=chunk)
+            shared = session.open_shared_input(collect,
+                                               device_index=processor.device_index,
+                                               rate=rate,
+                                               channels=channels,
+                                               format=audio_format,
+                                               frames_per_buffer=processor.hop_size)
             
             waveFile = wave.open(self.temp_audio_path, 'wb')
             waveFile.setnchannels(channels)
-            waveFile.setsampwidth(p.get_sample_size(audio_format))
+            waveFile.setsampwidth(session.p.get_sample_size(audio_format))
             waveFile.setframerate(rate)
 
             while self.is_recording:
-                data = stream.read(chunk, exception_on_overflow=False)
-                waveFile.writeframes(data)
+                try:
+                    waveFile.writeframes(chunks.get(timeout=0.1))
+                except Empty:
+                    continue
                 
-            stream.stop_stream()
-            stream.close()
+            shared.remove(collect)
+            shared = None
+            while not chunks.empty():
+                waveFile.writeframes(chunks.get_nowait())
             waveFile.close()
-            p.terminate()
 
         except Exception as e:
             print(f"Fehler bei Audio-Aufnahme: {e}")
             self.is_recording = False
+        finally:
+            if shared:
+                shared.remove(collect)
+            session.release()
 
     def capture_frame(self, screen):
         """Sendet einen Frame an FFmpeg."""
@@ -479,6 +551,7 @@ class ExportManager:
     def _merge_files_task(self):
         """Task to merge video and audio in a separate thread."""
         print("Starte den Merging-Prozess...")
+        import subprocess
         
         # Aufruf des externen decoder.py Skripts
         cmd = [
@@ -504,4 +577,5 @@ class ExportManager:
 
 if __name__ == "__main__":
     visualizer = HotVisualizer()
+    if startup_report: startup_report.mark("visualizer initialized")
     visualizer.run()
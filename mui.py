@@ -1,11 +1,11 @@
 # -----------------------------------------------------------------------------------------------
-# 3. Management and UI Components : class SettingsManager, UIManage, ScreenshotManager 
+# 3. Management and UI Components : class SettingsManager, UIManage, TextCache, HudLayer, GlyphAtlas, ScreenshotManager 
 # File: mui.py
 # -----------------------------------------------------------------------------------------------
 import pygame
 import os
+from collections import OrderedDict
 from datetime import datetime
-import tkinter
 
 
 class SettingsManager:
@@ -22,11 +22,34 @@ class SettingsManager:
 class UIManager:
     def __init__(self, screen, font):
         self.screen = screen
+        self.text = TextCache()
         self.font = font
-        self.small_font = pygame.font.Font(None, 20)
+        self.small_font = self.text.font(20)
+        self.glyph_atlas = GlyphAtlas(self.small_font)  # Matrix Rain characters
         self.show_settings = False
         self.show_device_menu = False
         self.selected_menu_item = 0
+        self._overlays = {}      # color -> full-screen surface, reused while the screen size stays the same
+        self._hud_layers = {}
+        self._settings_panel = None
+        self._settings_key = None
+
+    def overlay(self, color, alpha):
+        """Full-screen translucent surface in the given color, ready to blit."""
+        size = self.screen.get_size()
+        overlay = self._overlays.get(color)
+        if overlay is None or overlay.get_size() != size:
+            overlay = self._overlays[color] = pygame.Surface(size)
+            overlay.fill(color)
+        overlay.set_alpha(alpha)
+        return overlay
+
+    def hud(self, name):
+        """Persistent HUD layer by name, see HudLayer."""
+        layer = self._hud_layers.get(name)
+        if layer is None:
+            layer = self._hud_layers[name] = HudLayer(self.text)
+        return layer
 
     def draw_audio_level_meter(self, level, peak, x, y, width=200, height=20):
         pygame.draw.rect(self.screen, (50, 50, 50), (x, y, width, height))
@@ -37,12 +60,12 @@ class UIManager:
         peak_x = int(x + width * peak / 100)
         pygame.draw.line(self.screen, (255, 255, 255), (peak_x, y), (peak_x, y + height), 2)
         level_text = f"Level: {level:.1f}% Peak: {peak:.1f}%"
-        text = self.small_font.render(level_text, True, (255, 255, 255))
+        text = self.text.render(level_text, (255, 255, 255))
         self.screen.blit(text, (x, y + height + 5))
 
     def draw_beat_info(self, beats, bpm, sensitivity, x, y):
         beat_text = f"Beats: {beats} | BPM: {bpm} | Sensitivity: {sensitivity:.1f}"
-        text = self.small_font.render(beat_text, True, (255, 255, 255))
+        text = self.text.render(beat_text, (255, 255, 255))
         self.screen.blit(text, (x, y))
 
     def draw_device_menu(self, devices, current_device_index, x, y):
@@ -52,7 +75,7 @@ class UIManager:
         menu_rect = pygame.Rect(x, y, 400, menu_height)
         pygame.draw.rect(self.screen, (30, 30, 30), menu_rect)
         pygame.draw.rect(self.screen, (100, 100, 100), menu_rect, 2)
-        title = self.font.render("Audio Device Selection", True, (255, 255, 255))
+        title = self.text.render("Audio Device Selection", (255, 255, 255), 36)
         self.screen.blit(title, (x + 10, y + 10))
         
         for i, device in enumerate(devices[:10]):
@@ -63,53 +86,168 @@ class UIManager:
                 pygame.draw.rect(self.screen, (60, 60, 60), (x + 5, device_y - 2, 390, 22))
             color = (0, 255, 0) if is_current else (255, 255, 255)
             device_text = f"{device['name'][:40]}{'...' if len(device['name']) > 40 else ''}"
-            text = self.small_font.render(device_text, True, color)
+            text = self.text.render(device_text, color)
             self.screen.blit(text, (x + 10, device_y))
             info_text = f"({device['channels']}ch, {device['sample_rate']}Hz)"
-            info = self.small_font.render(info_text, True, (150, 150, 150))
+            info = self.text.render(info_text, (150, 150, 150))
             self.screen.blit(info, (x + 300, device_y))
 
     def draw_settings_overlay(self, settings, audio_processor):
         if not self.show_settings:
             return
-        overlay = pygame.Surface((self.screen.get_width(), self.screen.get_height()))
-        overlay.set_alpha(200)
-        overlay.fill((0, 0, 0))
-        self.screen.blit(overlay, (0, 0))
+        self.screen.blit(self.overlay((0, 0, 0), 200), (0, 0))
         
-        panel_width, panel_height = 500, 400
+        panel_width, panel_height = 500, 580
         panel_x = (self.screen.get_width() - panel_width) // 2
         panel_y = (self.screen.get_height() - panel_height) // 2
-        pygame.draw.rect(self.screen, (40, 40, 40), (panel_x, panel_y, panel_width, panel_height))
-        pygame.draw.rect(self.screen, (100, 100, 100), (panel_x, panel_y, panel_width, panel_height), 3)
-        title = self.font.render("🔥 SETTINGS 🔥", True, (255, 255, 0))
-        title_rect = title.get_rect(center=(panel_x + panel_width//2, panel_y + 30))
-        self.screen.blit(title, title_rect)
-        
-        y_offset = 80
         settings_text = [
 
             f"Beat Sensitivity: {audio_processor.beat_sensitivity:.1f} (Q/W to adjust)",
             f"Show FPS: {'ON' if settings.show_fps else 'OFF'} (Toggle: I)",
             f"Show Audio Info: {'ON' if settings.show_audio_info else 'OFF'} (Toggle: O)",
+            "Capture: {capture_mode} | Overruns: {overruns} | Underruns: {underruns}".format(
+                capture_mode=audio_processor.capture_mode, **audio_processor.get_capture_stats()),
             "",
             "Controls:",
             "ESC - Close Settings / Exit",
             "D - Audio Device Menu",
             "S - Take Screenshot",
+            "B - Band Layout (log/mel/octave/linear)",
+            "+/- - Bar Density (Circular Bars, Spiral)",
             "P - Play/Pause File",
             "K - Stop File",
-            "",
-            "",
+            "Left/Right - Seek 5s (Shift: 30s)",
+            "N - Next Track (Playlist)",
             "AWESOME AUDIO VISUALIZER 1.0.0",
             "Copyright VolkanSah",
         ]
         
-        for text in settings_text:
-            color = (255, 255, 255) if not text.startswith("Controls:") else (255, 255, 0)
-            rendered = self.small_font.render(text, True, color)
-            self.screen.blit(rendered, (panel_x + 20, panel_y + y_offset))
-            y_offset += 25
+        # the panel is only re-rendered when one of its lines changed
+        if settings_text != self._settings_key:
+            panel = self._settings_panel = pygame.Surface((panel_width, panel_height))
+            panel.fill((40, 40, 40))
+            pygame.draw.rect(panel, (100, 100, 100), (0, 0, panel_width, panel_height), 3)
+            title = self.text.render("🔥 SETTINGS 🔥", (255, 255, 0), 36)
+            panel.blit(title, title.get_rect(center=(panel_width // 2, 30)))
+            y_offset = 80
+            for text in settings_text:
+                color = (255, 255, 255) if not text.startswith("Controls:") else (255, 255, 0)
+                panel.blit(self.text.render(text, color), (20, y_offset))
+                y_offset += 25
+            self._settings_key = settings_text
+        self.screen.blit(self._settings_panel, (panel_x, panel_y))
+
+
+class TextCache:
+    """
+    Default-font objects per size and rendered text surfaces keyed by
+    (string, color, size). The least recently used surfaces are dropped once
+    max_entries is exceeded, so changing numbers cannot grow the cache forever.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._fonts = {}
+        self._surfaces = OrderedDict()
+
+    def font(self, size):
+        font = self._fonts.get(size)
+        if font is None:
+            font = self._fonts[size] = pygame.font.Font(None, size)
+        return font
+
+    def render(self, text, color, size=20):
+        """Antialiased text surface, rendered on the first request only."""
+        key = (text, tuple(color), size)
+        surface = self._surfaces.get(key)
+        if surface is None:
+            surface = self._surfaces[key] = self.font(size).render(text, True, color)
+            if len(self._surfaces) > self.max_entries:
+                self._surfaces.popitem(last=False)
+        else:
+            self._surfaces.move_to_end(key)
+        return surface
+
+
+class HudLayer:
+    """
+    A group of text items composed into one persistent surface that covers only
+    their bounding box. draw() recomposes it when the items differ from the
+    previous call and otherwise blits the existing surface.
+    """
+
+    def __init__(self, text_cache):
+        self.text_cache = text_cache
+        self.surface = None
+        self.rect = None
+        self._items = None
+
+    def draw(self, screen, items):
+        """items: sequence of (text, color, size, (x, y)) tuples."""
+        items = tuple(items)
+        if items != self._items:
+            self._compose(items)
+        if self.surface is not None:
+            screen.blit(self.surface, self.rect)
+
+    def _compose(self, items):
+        self._items = items
+        rendered = [(self.text_cache.render(text, color, size), pos) for text, color, size, pos in items]
+        if not rendered:
+            self.surface = None
+            return
+        rect = rendered[0][0].get_rect(topleft=rendered[0][1]).unionall(
+            [surface.get_rect(topleft=pos) for surface, pos in rendered[1:]])
+        if self.surface is None or self.surface.get_size() != rect.size:
+            self.surface = pygame.Surface(rect.size, pygame.SRCALPHA)
+        else:
+            self.surface.fill((0, 0, 0, 0))
+        for surface, (x, y) in rendered:
+            # MAX onto the transparent layer keeps the text's own alpha (no double blending)
+            self.surface.blit(surface, (x - rect.x, y - rect.y), special_flags=pygame.BLEND_RGBA_MAX)
+        self.rect = rect
+
+
+class GlyphAtlas:
+    """
+    The printable ASCII characters (33..126) rendered once in white into a single
+    surface. Colored copies are made with a multiply fill and kept per color, so
+    drawing a character is a plain blit of its rect from the matching copy.
+    """
+    FIRST_CHAR, LAST_CHAR = 33, 126
+
+    def __init__(self, font, max_tints=256):
+        glyphs = [font.render(chr(code), True, (255, 255, 255))
+                  for code in range(self.FIRST_CHAR, self.LAST_CHAR + 1)]
+        self.height = max(glyph.get_height() for glyph in glyphs)
+        self.surface = pygame.Surface((sum(glyph.get_width() for glyph in glyphs), self.height), pygame.SRCALPHA)
+        self.rects = []
+        x = 0
+        for glyph in glyphs:
+            # MAX onto the transparent atlas copies color and alpha unchanged (no alpha blending)
+            self.surface.blit(glyph, (x, 0), special_flags=pygame.BLEND_RGBA_MAX)
+            self.rects.append(pygame.Rect(x, 0, glyph.get_width(), glyph.get_height()))
+            x += glyph.get_width()
+        self.max_tints = max_tints
+        self._tints = OrderedDict()  # (r, g, b) -> tinted copy of the atlas, least recently used first
+
+    def rect(self, code):
+        """Source rect of the character with the given code point."""
+        return self.rects[code - self.FIRST_CHAR]
+
+    def tinted(self, color):
+        """The atlas in the given color; same pixels as font.render(char, True, color)."""
+        key = tuple(color)
+        surface = self._tints.get(key)
+        if surface is None:
+            surface = self.surface.copy()
+            surface.fill(key + (255,), special_flags=pygame.BLEND_RGBA_MULT)
+            self._tints[key] = surface
+            if len(self._tints) > self.max_tints:
+                self._tints.popitem(last=False)
+        else:
+            self._tints.move_to_end(key)
+        return surface
 
 
 class ScreenshotManager:
@@ -0,0 +1,118 @@
+# -----------------------------------------------------------------------------
+# 12. Color Palettes: class PaletteManager
+# File: palette.py
+# Every palette is precomputed into a uint8 RGB lookup table when it is
+# selected; draw modes map whole intensity arrays to colors with one index
+# operation (colors_for) instead of calling get_color per element.
+# User palettes (palettes.json) are color stops and use the same tables.
+# -----------------------------------------------------------------------------
+import colorsys
+import json
+import os
+import numpy as np
+
+
+def builtin_color(intensity, palette_name):
+    """The original per-intensity color formulas; only used to fill the lookup tables."""
+    if palette_name == "fire":
+        if intensity < 0.3: r = int(255 * intensity / 0.3); return (r, 0, 0)
+        elif intensity < 0.6: g = int(255 * (intensity - 0.3) / 0.3); return (255, g, 0)
+        else: b = int(255 * (intensity - 0.6) / 0.4); return (255, 255, b)
+    elif palette_name in ["electric", "ocean", "rainbow", "neon"]:
+        h = {"electric": 0.6 - intensity * 0.15, "ocean": 0.5 + intensity * 0.1,
+             "rainbow": intensity, "neon": 0.8 - intensity * 0.3}[palette_name]
+        s = {"ocean": 1.0 - intensity * 0.3}.get(palette_name, 1.0)
+        v = {"ocean": 0.3 + intensity * 0.7}.get(palette_name, 1.0)
+        rgb = colorsys.hsv_to_rgb(h, s, v)
+        return tuple(int(c * 255) for c in rgb)
+    return (255, 255, 255)
+
+
+class PaletteManager:
+    """
+    Palettes are sources (a function intensity -> (r, g, b), or a list of color stops
+    [[position 0..1, [r, g, b]], ...]) turned into SIZE-entry lookup tables on demand.
+    """
+    SIZE = 1024
+    BUILTIN = ("fire", "electric", "ocean", "rainbow", "neon")
+
+    def __init__(self, user_file="palettes.json"):
+        self.names = list(self.BUILTIN)
+        self._sources = {name: (lambda intensity, name=name: builtin_color(intensity, name)) for name in self.BUILTIN}
+        self._tables = {}
+        self.index = 0
+        if user_file and os.path.exists(user_file):
+            self.load_file(user_file)
+        self._table = self.table(self.current)
+
+    @property
+    def current(self):
+        return self.names[self.index]
+
+    def register(self, name, source):
+        """Adds or replaces a palette; source is a color function or a list of color stops."""
+        if not callable(source):
+            source = self._validate_stops(source)
+        self._sources[name] = source
+        self._tables.pop(name, None)
+        if name not in self.names:
+            self.names.append(name)
+        if name == self.current:
+            self._table = self.table(name)
+
+    def load_file(self, path):
+        """Loads user palettes: {"name": [[0.0, [r, g, b]], [1.0, [r, g, b]]], ...}."""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                palettes = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error loading palettes from {path}: {e}")
+            return
+        for name, stops in palettes.items():
+            try:
+                self.register(name, stops)
+            except (ValueError, TypeError) as e:
+                print(f"Skipping palette '{name}' in {path}: {e}")
+
+    def select(self, index):
+        """Switches palette; its table is built here, not while drawing."""
+        self.index = index % len(self.names)
+        self._table = self.table(self.current)
+
+    def next(self):
+        self.select(self.index + 1)
+
+    def table(self, name=None):
+        """(SIZE, 3) uint8 lookup table of a palette (default: current)."""
+        name = name or self.current
+        table = self._tables.get(name)
+        if table is None:
+            table = self._tables[name] = self._build(self._sources[name])
+        return table
+
+    def _build(self, source):
+        intensities = np.linspace(0.0, 1.0, self.SIZE)
+        if callable(source):
+            return np.array([source(i) for i in intensities.tolist()], dtype=np.uint8)
+        positions = [position for position, _ in source]
+        colors = np.array([color for _, color in source], dtype=np.float64)
+        channels = [np.interp(intensities, positions, colors[:, c]) for c in range(3)]
+        return np.rint(np.stack(channels, axis=1)).astype(np.uint8)
+
+    @staticmethod
+    def _validate_stops(stops):
+        stops = sorted((float(position), [int(c) for c in color]) for position, color in stops)
+        if not stops or any(len(color) != 3 or not all(0 <= c <= 255 for c in color) for _, color in stops):
+            raise ValueError("palette stops must be [position, [r, g, b]] with 0 <= r, g, b <= 255")
+        return stops
+
+    def colors_for(self, intensities, name=None):
+        """Maps intensities (0..1, any shape) to uint8 RGB with one lookup: shape + (3,)."""
+        table = self._table if name is None else self.table(name)
+        indices = (np.clip(intensities, 0.0, 1.0) * (self.SIZE - 1)).astype(np.intp)
+        return table[indices]
+
+    def color(self, intensity, name=None):
+        """Single color as a tuple, for code that draws one element at a time."""
+        table = self._table if name is None else self.table(name)
+        return tuple(table[int(max(0.0, min(1.0, intensity)) * (self.SIZE - 1))].tolist())
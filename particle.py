@@ -1,10 +1,11 @@
 # -----------------------------------------------------------------------------
-# 4. Visualizer Effects - class Particle 
+# 4. Visualizer Effects - class Particle, ParticleSystem
 # File: particle.py
 # -----------------------------------------------------------------------------
 import pygame
 import random
 import math
+import numpy as np
 
 class Particle:
     def __init__(self, x, y, vx=0, vy=0, life=60, color=(255, 255, 255)):
@@ -30,3 +31,91 @@ class Particle:
             color = tuple(int(c * alpha) for c in self.color)
             size = max(1, int(self.size * alpha))
             pygame.draw.circle(screen, color, (int(self.x), int(self.y)), size)
+
+
+class ParticleSystem:
+    """
+    Struct-of-arrays particle pool with a fixed capacity: positions, velocities, life,
+    color and size live in preallocated NumPy arrays, spawning fills free slots and
+    update/cull run as whole-array operations. Same motion as Particle.
+    """
+    GRAVITY = 0.1
+    DRAG = 0.99
+
+    def __init__(self, capacity=16384):
+        self.capacity = capacity
+        self.x = np.zeros(capacity, dtype=np.float32)
+        self.y = np.zeros(capacity, dtype=np.float32)
+        self.vx = np.zeros(capacity, dtype=np.float32)
+        self.vy = np.zeros(capacity, dtype=np.float32)
+        self.life = np.zeros(capacity, dtype=np.float32)
+        self.max_life = np.ones(capacity, dtype=np.float32)
+        self.size = np.zeros(capacity, dtype=np.float32)
+        self.color = np.zeros((capacity, 3), dtype=np.uint8)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.dropped = 0  # spawns rejected because the pool was full
+
+    def __len__(self):
+        return int(np.count_nonzero(self.alive))
+
+    def spawn(self, x, y, vx, vy, life, colors):
+        """
+        Spawns len(vx) particles (vx, vy arrays; x, y, life scalars or arrays; colors (n, 3)).
+        Returns the number spawned; anything beyond the free slots is dropped.
+        """
+        vx = np.asarray(vx, dtype=np.float32)
+        free = np.flatnonzero(~self.alive)[:len(vx)]
+        n = len(free)
+        self.dropped += len(vx) - n
+        if n == 0:
+            return 0
+        self.x[free] = np.broadcast_to(x, len(vx))[:n]
+        self.y[free] = np.broadcast_to(y, len(vx))[:n]
+        self.vx[free] = vx[:n] + np.random.uniform(-2, 2, n)
+        self.vy[free] = np.asarray(vy, dtype=np.float32)[:n] + np.random.uniform(-2, 2, n)
+        self.life[free] = self.max_life[free] = np.broadcast_to(life, len(vx))[:n]
+        self.size[free] = np.random.uniform(1, 4, n)
+        self.color[free] = np.asarray(colors, dtype=np.uint8)[:n]
+        self.alive[free] = True
+        return n
+
+    def update(self, bounds=None):
+        """One step for all particles; culls expired ones and, with bounds=(w, h), those that left the screen."""
+        self.x += self.vx
+        self.y += self.vy
+        self.vy += self.GRAVITY
+        self.vx *= self.DRAG
+        self.vy *= self.DRAG
+        self.life -= 1
+        self.alive &= self.life > 0
+        if bounds is not None:
+            # gravity never brings back particles below the screen, drag never reverses vx
+            width, height = bounds
+            self.alive &= (self.y < height + 4) & (self.x > -4) & (self.x < width + 4)
+
+    def draw(self, screen):
+        index = np.flatnonzero(self.alive)
+        if len(index) == 0:
+            return
+        alpha = self.life[index] / self.max_life[index]
+        colors = (self.color[index] * alpha[:, None]).astype(np.uint8)
+        sizes = np.maximum(1, (self.size[index] * alpha).astype(int))
+        xs = self.x[index].astype(int)
+        ys = self.y[index].astype(int)
+
+        # pygame draws radius 1 as the 2x2 block (x-1..x, y-1..y): write those in one go
+        # through a pixel view, draw circles only for the larger ones
+        width, height = screen.get_size()
+        single = (sizes == 1) & (xs >= 1) & (xs < width) & (ys >= 1) & (ys < height)
+        try:
+            pixels = pygame.surfarray.pixels3d(screen)
+            px, py, block_colors = xs[single], ys[single], colors[single]
+            for dx in (-1, 0):
+                for dy in (-1, 0):
+                    pixels[px + dx, py + dy] = block_colors
+            del pixels  # unlock the surface
+        except (ValueError, pygame.error):  # surface format without a pixel view
+            single[:] = False
+        rest = ~single
+        for px, py, color, size in zip(xs[rest].tolist(), ys[rest].tolist(), colors[rest].tolist(), sizes[rest].tolist()):
+            pygame.draw.circle(screen, color, (px, py), size)
@@ -0,0 +1,111 @@
+# -----------------------------------------------------------------------------
+# 10. Playlist: class Playlist
+# File: playlist.py
+# Queue of audio files for FileProcessor. The next tracks are analyzed in the
+# background into the AnalysisCache, so the hand-off at the end of a track is
+# gapless: pygame.mixer.music.queue() plays the audio, FileProcessor swaps the
+# memory-mapped analysis at the same moment.
+# -----------------------------------------------------------------------------
+import os
+import threading
+
+from analysiscache import AnalysisCache
+from fileprocessor import FileProcessor
+
+
+class Playlist:
+    """Tracks are file paths; prepared entries are (meta, arrays) from AnalysisCache.load()."""
+
+    PREFETCH = 2  # tracks analyzed ahead; bounds the number of open cache entries
+
+    def __init__(self, processor, paths=(), prefetch=PREFETCH):
+        self.processor = processor
+        self.tracks = list(paths)
+        self.index = 0
+        self.prefetch = prefetch
+        self.cache = processor.cache or AnalysisCache()
+        # headless analyzer for the prefetch thread (shares the process pool with the processor)
+        self._analyzer = FileProcessor(cache=self.cache, playback=False)
+        self._prepared = {}
+        self._failed = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._switches_seen = processor.track_switches
+
+    def current(self):
+        return self.tracks[self.index] if self.index < len(self.tracks) else None
+
+    def upcoming(self):
+        return self.tracks[self.index + 1:self.index + 1 + self.prefetch]
+
+    def add(self, paths):
+        self.tracks.extend(paths)
+        self.start_prefetch()
+
+    def update(self):
+        """Call once per frame: follows gapless switches and queues the next track in the mixer."""
+        if self.processor.track_switches != self._switches_seen:
+            self._switches_seen = self.processor.track_switches
+            self.index += 1
+            self.start_prefetch()
+
+        if (self.processor.next_track is None and self.processor.playback_state == 'playing'
+                and self.index + 1 < len(self.tracks)):
+            next_path = self.tracks[self.index + 1]
+            with self._lock:
+                cached = self._prepared.get(next_path)
+            if cached:
+                self.processor.queue_next(next_path, cached)
+
+    def skip(self):
+        """
+        Jumps to the next track. Returns None if it was prepared and is already playing,
+        otherwise the path the caller has to load (e.g. in its loading thread).
+        """
+        if self.index + 1 >= len(self.tracks):
+            return None
+        self.index += 1
+        path = self.tracks[self.index]
+        with self._lock:
+            cached = self._prepared.get(path)
+        self.start_prefetch()
+        if cached:
+            self.processor.play_track(path, cached)
+            return None
+        return path
+
+    def start_prefetch(self):
+        """Drops entries outside the prefetch window and analyzes the missing ones in the background."""
+        with self._lock:
+            window = set(self.upcoming())
+            self._prepared = {path: entry for path, entry in self._prepared.items() if path in window}
+            if self._thread is None and self._missing():
+                self._thread = threading.Thread(target=self._prefetch_task, daemon=True)
+                self._thread.start()
+
+    def _missing(self):
+        return [path for path in self.upcoming() if path not in self._prepared and path not in self._failed]
+
+    def _prefetch_task(self):
+        params = self._analyzer.analysis_params()
+        while True:
+            with self._lock:
+                missing = self._missing()
+                if not missing:
+                    self._thread = None
+                    return
+            path = missing[0]
+            try:
+                key = self.cache.make_key(path, params)
+                if not self.cache.contains(key):
+                    print(f"Prefetch: analyzing '{os.path.basename(path)}'")
+                    self._analyzer.load_and_analyze(path)
+                entry = self.cache.load(key)
+            except OSError as e:
+                print(f"Prefetch failed for '{path}': {e}")
+                entry = None
+            with self._lock:
+                if entry is None:
+                    self._failed.add(path)
+                elif path in self.upcoming():
+                    self._prepared[path] = entry
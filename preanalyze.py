@@ -0,0 +1,107 @@
+# -----------------------------------------------------------------------------
+# 9. Batch Pre-Analysis: fills the analysis cache for a whole music directory
+# File: preanalyze.py
+# Usage: python preanalyze.py <directory> [--cache-dir analysis_cache] [--workers N]
+# Files are analyzed in parallel, one file per worker process; unchanged files
+# already in the cache are skipped, so re-runs only cost the stat() calls.
+# -----------------------------------------------------------------------------
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from analysiscache import AnalysisCache
+from fileprocessor import FileProcessor, InlineExecutor
+
+# only formats pygame.mixer can play back; analyzing anything else would just fill the cache
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.ogg', '.flac', '.aiff', '.aif')
+
+_processor = None  # one FileProcessor per worker process
+
+
+def find_audio_files(directory, extensions=AUDIO_EXTENSIONS):
+    """All audio files below directory, sorted for a stable order."""
+    paths = []
+    for root, _, names in os.walk(directory):
+        paths.extend(os.path.join(root, name) for name in names if name.lower().endswith(extensions))
+    return sorted(paths)
+
+
+def _init_worker(cache_dir, max_bytes):
+    global _processor
+    # the worker itself is the parallelism: run the analysis stages inline
+    _processor = FileProcessor(cache=AnalysisCache(cache_dir, max_bytes), playback=False, pool=InlineExecutor())
+
+
+def _analyze_file(path):
+    """Runs in a worker; returns (path, ok, audio seconds, stage timings)."""
+    start = time.perf_counter()
+    _processor.load_and_analyze(path)
+    stage_times = dict(_processor.stage_times, total=time.perf_counter() - start)
+    return path, _processor.analysis_complete, _processor.duration, stage_times
+
+
+def preanalyze(directory, cache_dir, workers, max_bytes):
+    cache = AnalysisCache(cache_dir, max_bytes)
+    params = FileProcessor(cache=cache, playback=False).analysis_params()
+    files = find_audio_files(directory)
+
+    pending = []
+    for path in files:
+        try:
+            if not cache.contains(cache.make_key(path, params)):
+                pending.append(path)
+        except OSError as e:
+            print(f"Skipping unreadable file {path}: {e}")
+    print(f"{len(files)} audio files, {len(files) - len(pending)} already cached, {len(pending)} to analyze "
+          f"with {workers} workers")
+    if not pending:
+        return
+
+    analyzed, failed, audio_seconds = 0, [], 0.0
+    stage_totals = {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(cache_dir, max_bytes)) as pool:
+        tasks = [pool.submit(_analyze_file, path) for path in pending]
+        for done, task in enumerate(as_completed(tasks), 1):
+            path, ok, duration, stage_times = task.result()
+            if not ok:
+                failed.append(path)
+                continue
+            analyzed += 1
+            audio_seconds += duration
+            for stage, seconds in stage_times.items():
+                stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+            print(f"[{done}/{len(pending)}] {os.path.basename(path)}: {duration / 60:.1f} min audio "
+                  f"in {stage_times['total']:.1f} s")
+    elapsed_min = (time.perf_counter() - start) / 60
+
+    print()
+    print(f"Analyzed {analyzed} tracks ({audio_seconds / 3600:.2f} h audio) in {elapsed_min * 60:.1f} s")
+    if elapsed_min > 0:
+        print(f"Throughput: {analyzed / elapsed_min:.1f} tracks/min, "
+              f"{audio_seconds / 3600 / elapsed_min:.2f} audio-hours/min")
+    if stage_totals:
+        print("Stage timings (summed over workers):")
+        total = stage_totals.pop('total')
+        for stage, seconds in sorted(stage_totals.items(), key=lambda item: -item[1]):
+            print(f"  {stage:<20} {seconds:8.1f} s  {seconds / max(total, 1e-9) * 100:5.1f} %")
+    if failed:
+        print(f"{len(failed)} files failed:")
+        for path in failed:
+            print(f"  {path}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Pre-analyze a music directory into the analysis cache.")
+    parser.add_argument('directory', help="Directory to scan recursively")
+    parser.add_argument('--cache-dir', default="analysis_cache", help="Cache directory used by the visualizer")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Parallel worker processes")
+    parser.add_argument('--max-gb', type=float, default=2.0,
+                        help="Cache size limit; least recently used entries beyond it are evicted")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        parser.error(f"not a directory: {args.directory}")
+    preanalyze(args.directory, args.cache_dir, max(1, args.workers), int(args.max_gb * 1024 ** 3))
@@ -0,0 +1,70 @@
+# -----------------------------------------------------------------------------
+# 11. Startup Report: class StartupReport
+# File: startup.py
+# Usage: python main.py --startup-report
+# Times every top-level import of main.py (including what it pulls in) and
+# the time to the first rendered frame. Kept free of third-party imports so
+# it can be loaded before everything else.
+# -----------------------------------------------------------------------------
+import builtins
+import sys
+import threading
+import time
+
+
+class StartupReport:
+    FLAG = "--startup-report"
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.imports = []   # (module name, seconds incl. nested imports)
+        self.marks = []     # (label, seconds since start)
+        self._original_import = None
+        self._local = threading.local()  # import nesting depth per thread (the hook is process-wide)
+
+    @classmethod
+    def from_argv(cls, argv):
+        """Returns an installed report if the flag is given, else None."""
+        if cls.FLAG not in argv:
+            return None
+        argv.remove(cls.FLAG)
+        report = cls()
+        report.install()
+        return report
+
+    def install(self):
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def uninstall(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        # only first-time imports at the outermost level; nested ones are included in their parent
+        depth = getattr(self._local, 'depth', 0)
+        self._local.depth = depth + 1
+        try:
+            if depth or level or name in sys.modules:
+                return self._original_import(name, globals, locals, fromlist, level)
+            start = time.perf_counter()
+            try:
+                return self._original_import(name, globals, locals, fromlist, level)
+            finally:
+                self.imports.append((name, time.perf_counter() - start))
+        finally:
+            self._local.depth = depth
+
+    def mark(self, label):
+        self.marks.append((label, time.perf_counter() - self.start))
+
+    def print_report(self):
+        self.uninstall()
+        print("Startup report")
+        print("  Imports (first load, including dependencies):")
+        for name, seconds in sorted(self.imports, key=lambda item: -item[1]):
+            print(f"    {name:<24} {seconds * 1000:8.1f} ms")
+        print(f"    {'total':<24} {sum(seconds for _, seconds in self.imports) * 1000:8.1f} ms")
+        for label, seconds in self.marks:
+            print(f"  {label:<26} {seconds * 1000:8.1f} ms")